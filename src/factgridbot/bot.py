@@ -1,25 +1,65 @@
 import datetime
+import functools
 import logging
-from collections import defaultdict
-from collections.abc import Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from contextlib import AbstractContextManager, nullcontext
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 from rich.console import Console
 from rich.table import Table
+from wikibaseintegrator.entities import ItemEntity
+from wikibaseintegrator.models import References
+from wikibaseintegrator.wbi_exceptions import MWApiError
 
-from factgridbot.factgrid import FactGrid
+from factgridbot.circuit_breaker import CircuitBreaker, CircuitOpenError
+from factgridbot.factgrid import WIKIDATA_WIKI_PAGE_PREFIX, FactGrid
 from factgridbot.models.auth import Authorization
 from factgridbot.models.error import SyncErrorRecord
 from factgridbot.wikidata import Wikidata
 
 logger = logging.getLogger(__name__)
 
+# error message of the mappings that are skipped because the circuit breaker is open
+CIRCUIT_OPEN_ERROR_MESSAGE = "Skipped because Wikidata failed repeatedly (circuit breaker open)"
+# retries of the Wikidata requests guarded by a circuit breaker. wikibaseintegrator retries unavailable services up to
+# 100 times with a delay of 60s by default which would delay noticing an outage by more than an hour
+CIRCUIT_BREAKER_MAX_RETRIES = 3
+CIRCUIT_BREAKER_RETRY_AFTER = 5
+
+
+def track_wikidata_request(circuit_breaker: CircuitBreaker | None) -> AbstractContextManager:
+    """Record the outcome of the Wikidata request executed in the with block in the given circuit breaker
+    Api errors (MWApiError) mean that Wikidata responded and are specific to the requested entities
+    :param circuit_breaker: if None the outcome is not recorded
+    :return:
+    """
+    if circuit_breaker is None:
+        return nullcontext()
+    return circuit_breaker.track(ignore=(MWApiError,))
+
+
+def get_retry_params(
+    circuit_breaker: CircuitBreaker | None, max_retries: int | None = None
+) -> tuple[int | None, int | None]:
+    """Get the retry parameters of a Wikidata request
+    :param circuit_breaker: circuit breaker guarding the request. If given the request is retried only a few times
+    :param max_retries: maximum number of retries. Overrides the default of the circuit breaker
+    :return: max_retries and retry_after. None means the default of wikibaseintegrator
+    """
+    if circuit_breaker is None:
+        return max_retries, None
+    return max_retries if max_retries is not None else CIRCUIT_BREAKER_MAX_RETRIES, CIRCUIT_BREAKER_RETRY_AFTER
+
 
 class Bot:
     """Wikibase Bot"""
 
     AUTH_STORAGE = Path.home() / ".config" / "WikibaseMigrator" / "bot" / "bot_auth.json"
+    # number of processed mappings after which the progress is reported
+    PROGRESS_BATCH_SIZE = 16
 
     def __init__(self, auth: Authorization):
         """constructor"""
@@ -33,12 +73,22 @@ class Bot:
         """Load authorization config from file"""
         if cls.AUTH_STORAGE.exists():
             logger.info(f"Loading auth config from {cls.AUTH_STORAGE}")
-            auth = Authorization.model_validate_json(cls.AUTH_STORAGE.read_text())
+            auth = cls._parse_auth(cls.AUTH_STORAGE, cls.AUTH_STORAGE.stat().st_mtime_ns)
         else:
             logger.info("Authorization config is not defined using default fallback")
             auth = Authorization()
         return auth
 
+    @staticmethod
+    @functools.cache
+    def _parse_auth(path: Path, modified_at: int) -> Authorization:
+        """Parse the authorization config file. The result is cached until the file is modified
+        :param path: location of the config file
+        :param modified_at: modification time of the file used as part of the cache key
+        :return:
+        """
+        return Authorization.model_validate_json(path.read_text())
+
     @classmethod
     def store_auth(cls, auth: Authorization) -> None:
         """Store authorization config in file"""
@@ -52,8 +102,12 @@ class Bot:
 
     def check_duplicates_property_mappings(self):
         """Check if duplicate property mappings exist and if so print them to the console"""
-        factgrid_to_wd = self.factgrid.get_prop_mapping_factgrid_to_wikidata()
-        wd_to_factgrid = self.factgrid.get_prop_mapping_wikidata_to_factgrid()
+        for table in self.get_duplicate_property_mapping_tables():
+            self.console.print(table)
+
+    def get_duplicate_property_mapping_tables(self) -> tuple[Table, Table]:
+        """Get the tables of the duplicate property mappings from FactGrid to Wikidata and from Wikidata to FactGrid"""
+        factgrid_to_wd, wd_to_factgrid = self.factgrid.get_prop_mappings_both_directions()
         factgrid_to_wd_table = Table(
             title="Property Mappings from FactGrid to Wikidata",
             show_header=True,
@@ -62,16 +116,24 @@ class Bot:
         factgrid_to_wd_table.add_column("FactGrid")
         factgrid_to_wd_table.add_column("Count")
         factgrid_to_wd_table.add_column("Wikidata")
-        factgrid_labels = self.factgrid.get_entity_label(list(factgrid_to_wd.keys()))
-        wd_labels = self.wikidata.get_entity_label(list(wd_to_factgrid.keys()))
-        for factgrid_prop, wd_props in factgrid_to_wd.items():
-            if len(wd_props) > 1:
-                factgrid_to_wd_table.add_row(
-                    self._get_rich_url(factgrid_prop, factgrid_labels.get(factgrid_prop)),
-                    str(len(wd_props)),
-                    ", ".join([self._get_rich_url(wd_prop, wd_labels.get(wd_prop)) for wd_prop in wd_props]),
-                )
-        self.console.print(factgrid_to_wd_table)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            factgrid_labels_future = executor.submit(self.factgrid.get_entity_label, factgrid_to_wd.keys())
+            wd_labels_future = executor.submit(self.wikidata.get_entity_label, wd_to_factgrid.keys())
+            factgrid_labels = factgrid_labels_future.result()
+            wd_labels = wd_labels_future.result()
+        get_rich_url = self._get_rich_url
+        factgrid_label_of, wd_label_of = factgrid_labels.get, wd_labels.get
+        factgrid_to_wd_rows = [
+            (
+                get_rich_url(factgrid_prop, factgrid_label_of(factgrid_prop)),
+                str(len(wd_props)),
+                ", ".join(get_rich_url(wd_prop, wd_label_of(wd_prop)) for wd_prop in wd_props),
+            )
+            for factgrid_prop, wd_props in factgrid_to_wd.items()
+            if len(wd_props) > 1
+        ]
+        for row in factgrid_to_wd_rows:
+            factgrid_to_wd_table.add_row(*row)
 
         wd_to_factgrid_table = Table(
             title="Property Mappings from Wikidata to FactGrid",
@@ -81,35 +143,48 @@ class Bot:
         wd_to_factgrid_table.add_column("Wikidata")
         wd_to_factgrid_table.add_column("Count")
         wd_to_factgrid_table.add_column("FactGrid")
-        for wd_prop, factgrid_props in wd_to_factgrid.items():
-            if len(factgrid_props) > 1:
-                wd_to_factgrid_table.add_row(
-                    self._get_rich_url(wd_prop, wd_labels.get(wd_prop)),
-                    str(len(factgrid_props)),
-                    ", ".join(
-                        [
-                            self._get_rich_url(factgrid_prop, factgrid_labels.get(factgrid_prop))
-                            for factgrid_prop in factgrid_props
-                        ],
-                    ),
-                )
-        self.console.print(wd_to_factgrid_table)
+        wd_to_factgrid_rows = [
+            (
+                get_rich_url(wd_prop, wd_label_of(wd_prop)),
+                str(len(factgrid_props)),
+                ", ".join(
+                    get_rich_url(factgrid_prop, factgrid_label_of(factgrid_prop)) for factgrid_prop in factgrid_props
+                ),
+            )
+            for wd_prop, factgrid_props in wd_to_factgrid.items()
+            if len(factgrid_props) > 1
+        ]
+        for row in wd_to_factgrid_rows:
+            wd_to_factgrid_table.add_row(*row)
+        return factgrid_to_wd_table, wd_to_factgrid_table
 
-    def _get_rich_url(self, entity_url: str, label: str) -> str:
+    def _get_rich_url(self, entity_url: str, label: str | None) -> str:
         """Get rich url str
         :param entity_url:
-        :param label:
+        :param label: None if the entity has no label
         :return:
         """
-        qid = entity_url.split("/")[-1]
+        qid = entity_url.rpartition("/")[2]
         return f"[link={entity_url}]{label} ({qid})[/link]"
 
     def check_property_type_mappings(self):
+        """Check if mapped properties have different datatypes and if so print them to the console"""
+        self.console.print(self.get_property_type_mismatch_table())
+
+    def get_property_type_mismatch_table(self) -> Table:
+        """Get the table of the property mappings whose FactGrid and Wikidata properties have different datatypes"""
         mappings = self.factgrid.get_prop_mappings()
-        factgrid_labels = self.factgrid.get_entity_label([factgrid_prop for (wd_prop, factgrid_prop) in mappings])
-        wd_labels = self.wikidata.get_entity_label([wd_prop for (wd_prop, factgrid_prop) in mappings])
-        wd_types = self.wikidata.get_property_types_of({wd_prop for (wd_prop, factgrid_prop) in mappings})
-        factgrid_types = self.factgrid.get_property_types_of({factgrid_prop for (wd_prop, factgrid_prop) in mappings})
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            wd_props_future = executor.submit(
+                self.wikidata.get_property_labels_and_types,
+                {wd_prop for (wd_prop, factgrid_prop) in mappings},
+            )
+            factgrid_props_future = executor.submit(
+                self.factgrid.get_property_labels_and_types,
+                {factgrid_prop for (wd_prop, factgrid_prop) in mappings},
+            )
+            wd_props = wd_props_future.result()
+            factgrid_props = factgrid_props_future.result()
         table = Table(
             title="Property Mappings with different Dataypes",
             show_header=True,
@@ -119,97 +194,234 @@ class Bot:
         table.add_column("Wikidata Datatype")
         table.add_column("FactGrid Datatype")
         table.add_column("FactGrid")
+        unknown = (None, None)
         for wd_prop, factgrid_prop in mappings:
-            if factgrid_types.get(factgrid_prop) != wd_types.get(wd_prop):
-                table.add_row(
-                    self._get_rich_url(wd_prop, wd_labels.get(wd_prop)),
-                    wd_types.get(wd_prop),
-                    factgrid_types.get(factgrid_prop),
-                    self._get_rich_url(factgrid_prop, factgrid_labels.get(factgrid_prop)),
-                )
-        self.console.print(table)
+            wd_label, wd_type = wd_props.get(wd_prop, unknown)
+            factgrid_label, factgrid_type = factgrid_props.get(factgrid_prop, unknown)
+            if wd_type == factgrid_type:
+                continue
+            table.add_row(
+                self._get_rich_url(wd_prop, wd_label),
+                wd_type,
+                factgrid_type,
+                self._get_rich_url(factgrid_prop, factgrid_label),
+            )
+        return table
 
     def get_all_missing_factgrid_items_in_wd(self) -> list[tuple[str, str]]:
         """Get all the wikidata items that are linked in FactGrid but not in Wikidata
         :return: List of tuples. first tuple item is the wikidata item second is the corresponding factgrid id
         """
+        return list(self.iter_all_missing_factgrid_items_in_wd())
+
+    def iter_all_missing_factgrid_items_in_wd(self) -> Iterator[tuple[str, str]]:
+        """Yield all the wikidata items that are linked in FactGrid but not in Wikidata
+        The mappings are yielded as soon as the mapping query of their chunk finished
+        :return: tuples of the wikidata item and the corresponding factgrid id
+        """
         logger.info("Query all Wikidata item references in FactGrid")
-        wd_references_wiki = self.factgrid.get_all_referenced_wikidata_items()
-        wd_wiki_prefix = "https://www.wikidata.org/wiki/"
-        wd_item_prefix = self.wikidata.item_prefix.unicode_string()
-        wd_referenced_entities = {wd_item_prefix + wd_id.removeprefix(wd_wiki_prefix) for wd_id in wd_references_wiki}
+        wd_item_prefix = self.wikidata.item_prefix_str
+        wd_referenced_entities = {
+            wd_item_prefix + wd_id.removeprefix(WIKIDATA_WIKI_PAGE_PREFIX)
+            for wd_id in self.factgrid.iter_all_referenced_wikidata_items()
+        }
         logger.info("Retrieving all Wikidata items with missing FactGrid reference")
         wd_missing_ref = self.wikidata.retrieve_missing_factgrid_reference(wd_referenced_entities)
+        # release the candidate set (all referenced items) before the mapping query allocates its result
+        del wd_referenced_entities
         logger.info("Query FactGrid for the mapping between Wikidata and FactGrid")
-        missing_wd_ref_mapping = self.factgrid.get_item_mapping_for(wd_missing_ref)
-        return missing_wd_ref_mapping
+        yield from self.factgrid.iter_item_mapping_for(wd_missing_ref)
+
+    def filter_missing_factgrid_reference(self, mappings: list[tuple[str, str]]) -> list[tuple[str, str]]:
+        """Filter the given mappings to those whose Wikidata item is still missing the FactGrid ID
+        :param mappings: List of tuples. first tuple item is the wikidata item second is the corresponding factgrid id
+        :return:
+        """
+        wd_ids = {wd_id for wd_id, _ in mappings if wd_id}
+        if not wd_ids:
+            return mappings
+        wd_missing_ref = self.wikidata.retrieve_missing_factgrid_reference(wd_ids)
+        return [(wd_id, factgrid_id) for wd_id, factgrid_id in mappings if not wd_id or wd_id in wd_missing_ref]
 
     def get_missing_wd_to_factgrid_item_reference_for(
         self,
         date: datetime.date | datetime.datetime,
+        batch_size: int = 10000,
     ) -> list[tuple[str, str]]:
         """Get misssing Wikidata item references for the items that were modified on the given date
         :param date:
+        :param batch_size: number of modified entities that are processed together
         :return:
         """
         logger.info(f"Querying entities that were modified at {date}")
         modified_entities = self.factgrid.get_items_modified_at(start_date=date)
         logger.info(f"{len(modified_entities)} were modified at the {date}")
-        logger.info("Querying Wikidata mapping for edited entities")
-        wd_to_factgrid_map = self.factgrid.get_reverse_item_mapping_for(modified_entities)
-        referenced_wd_entities = {wd_id for wd_id, _ in wd_to_factgrid_map}
-        logger.info(f"{len(referenced_wd_entities)} entities were linked to Wikidata")
-        wd_missing_ref = self.wikidata.retrieve_missing_factgrid_reference(referenced_wd_entities)
-        logger.info(f"{len(wd_missing_ref)} Wikidata entities are missing the FactGrid ID")
-        return [(wd_id, factgrid_id) for wd_id, factgrid_id in wd_to_factgrid_map if wd_id in wd_missing_ref]
+        mappings = list(self.iter_missing_wd_to_factgrid_item_reference(modified_entities, batch_size=batch_size))
+        logger.info(f"{len(mappings)} Wikidata entities are missing the FactGrid ID")
+        return mappings
+
+    def iter_missing_wd_to_factgrid_item_reference(
+        self,
+        factgrid_entities: Iterable[str],
+        batch_size: int = 10000,
+    ) -> Iterator[tuple[str, str]]:
+        """Yield the Wikidata to FactGrid mappings of the given FactGrid entities for which the Wikidata item is
+        missing the FactGrid ID. The entities are processed in batches so that only the intermediate results of a
+        single batch are held in memory
+        :param factgrid_entities:
+        :param batch_size: number of FactGrid entities that are processed together
+        :return:
+        """
+        for factgrid_entities_batch in self.factgrid.chunks(sorted(factgrid_entities), batch_size):
+            logger.info(f"Querying Wikidata mapping for {len(factgrid_entities_batch)} FactGrid entities")
+            wd_to_factgrid_map = self.factgrid.get_reverse_item_mapping_for(factgrid_entities_batch)
+            referenced_wd_entities = {wd_id for wd_id, _ in wd_to_factgrid_map}
+            logger.info(f"{len(referenced_wd_entities)} entities were linked to Wikidata")
+            wd_missing_ref = self.wikidata.retrieve_missing_factgrid_reference(referenced_wd_entities)
+            yield from ((wd_id, factgrid_id) for wd_id, factgrid_id in wd_to_factgrid_map if wd_id in wd_missing_ref)
 
     def sync_wd_with_factgrid_ids(
         self,
         mappings: list[tuple[str, str]],
-        progress_callback: Callable[[None], None] | None = None,
+        progress_callback: Callable[[int], None] | None = None,
         fix_known_issues: bool = False,
         max_retries: int | None = None,
+        max_workers: int = 4,
+        read_workers: int = 8,
     ) -> list[SyncErrorRecord]:
         """Sync Wikidata with FactGrid by adding the FactGrid ids to the corresponding Wikidata entities
+        The Wikidata items are retrieved in chunks with a single request per chunk by the read workers and handed over
+        to the write workers as soon as they are retrieved
         :param fix_known_issues:
-        :param progress_callback:
+        :param progress_callback: called with the number of processed mappings after every PROGRESS_BATCH_SIZE mappings
         :param mappings:
+        :param max_workers: number of parallel edits. Rate limited accounts (no bot flag) should use 1
+        :param read_workers: number of parallel item retrievals. Reads are not subject to the edit rate limit
         :return:
         """
         failed = []
-        # needs bot access to increase worker count
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            futures = []
-            for wd_id, factgrid_id in mappings:
-                future = executor.submit(
-                    self._sync_wd_with_factgrid_id,
-                    wd_id=wd_id,
-                    factgrid_id=factgrid_id,
-                    fix_known_issues=fix_known_issues,
-                    max_retries=max_retries,
-                )
-                futures.append(future)
-                if progress_callback:
-                    future.add_done_callback(progress_callback)  # type: ignore
-            for future in as_completed(futures):
+        # the references of the added claims are the same for all items of this run
+        references = self.wikidata.get_factgrid_references()
+        # stop sending requests to Wikidata while it is unavailable
+        circuit_breaker = CircuitBreaker()
+        # bound the number of retrieved items waiting for their edit so that items are only fetched shortly before
+        max_pending_writes = 2 * max_workers * self.wikidata.MAX_ENTITIES_PER_REQUEST
+
+        # processed mappings that are not yet reported
+        unreported = 0
+
+        def report_progress(processed: int):
+            nonlocal unreported
+            unreported += processed
+            if progress_callback and unreported >= self.PROGRESS_BATCH_SIZE:
+                progress_callback(unreported)
+                unreported = 0
+
+        def handle_written(futures: Iterable[Future]):
+            for future in futures:
                 result = future.result()
                 if isinstance(result, SyncErrorRecord):
                     failed.append(result)
-                    logger.debug(f"Failed to add {factgrid_id} to {wd_id}")
+                    logger.debug(f"Failed to add {result.factgrid_id} to {result.wd_id}")
                     logger.error(result.error_message)
-                else:
-                    logger.debug(f"Added {factgrid_id} to {wd_id}")
+                report_progress(1)
+
+        with (
+            ThreadPoolExecutor(max_workers=read_workers) as read_executor,
+            ThreadPoolExecutor(max_workers=max_workers) as write_executor,
+        ):
+            pending_reads: set[Future] = set()
+            pending_writes: set[Future] = set()
+            # mappings of the pending reads to report them as failed if the read is skipped
+            read_mappings: dict[Future, list[tuple[str, str]]] = {}
+
+            def submit_writes(read_futures: Iterable[Future]):
+                for read_future in read_futures:
+                    mappings_chunk = read_mappings.pop(read_future)
+                    try:
+                        wd_items = read_future.result()
+                    except CircuitOpenError as ex:
+                        failed.extend(
+                            SyncErrorRecord(wd_id=wd_id, factgrid_id=factgrid_id, error_message=str(ex))
+                            for wd_id, factgrid_id in mappings_chunk
+                        )
+                        report_progress(len(mappings_chunk))
+                        continue
+                    for wd_id, factgrid_id, wd_item in wd_items:
+                        future = write_executor.submit(
+                            self._sync_wd_with_factgrid_id,
+                            wd_id=wd_id,
+                            factgrid_id=factgrid_id,
+                            wd_item=wd_item,
+                            references=references,
+                            fix_known_issues=fix_known_issues,
+                            max_retries=max_retries,
+                            circuit_breaker=circuit_breaker,
+                        )
+                        pending_writes.add(future)
+
+            for mappings_chunk in self.wikidata.chunks(mappings, self.wikidata.MAX_ENTITIES_PER_REQUEST):
+                read_future = read_executor.submit(self._get_wd_items_of, mappings_chunk, circuit_breaker)
+                read_mappings[read_future] = mappings_chunk
+                pending_reads.add(read_future)
+                if len(pending_reads) >= read_workers:
+                    done, pending_reads = wait(pending_reads, return_when=FIRST_COMPLETED)
+                    submit_writes(done)
+                while len(pending_writes) > max_pending_writes:
+                    done, pending_writes = wait(pending_writes, return_when=FIRST_COMPLETED)
+                    handle_written(done)
+            submit_writes(as_completed(pending_reads))
+            handle_written(as_completed(pending_writes))
+        if progress_callback and unreported:
+            progress_callback(unreported)
         return failed
 
+    def _get_wd_items_of(
+        self,
+        mappings: list[tuple[str, str]],
+        circuit_breaker: CircuitBreaker | None = None,
+    ) -> list[tuple[str, str, ItemEntity | None]]:
+        """Retrieve the Wikidata items of the given mappings with a single request
+        :param mappings:
+        :param circuit_breaker: skips the retrieval if Wikidata failed repeatedly
+        :return: the mappings extended by the Wikidata item. None if the item could not be retrieved
+        :raises CircuitOpenError: if the retrieval is skipped
+        """
+        wd_items = {}
+        if circuit_breaker is not None and not circuit_breaker.allow_request():
+            logger.warning(f"Skipping retrieval of {len(mappings)} Wikidata items because of repeated failures")
+            raise CircuitOpenError(CIRCUIT_OPEN_ERROR_MESSAGE)
+        max_retries, retry_after = get_retry_params(circuit_breaker)
+        try:
+            with track_wikidata_request(circuit_breaker):
+                wd_items = self.wikidata.get_items(
+                    (wd_id for wd_id, _ in mappings if wd_id),
+                    props=self.wikidata.CLAIM_EDIT_PROPS,
+                    max_retries=max_retries,
+                    retry_after=retry_after,
+                )
+        except Exception as ex:
+            logger.error(f"Failed to retrieve Wikidata items: {ex}")
+        return [
+            (wd_id, factgrid_id, wd_items.get(self.wikidata.get_entity_id(wd_id)) if wd_id else None)
+            for wd_id, factgrid_id in mappings
+        ]
+
     def _sync_wd_with_factgrid_id(
         self,
         wd_id: str,
         factgrid_id: str,
+        wd_item: ItemEntity | None,
+        references: References | None = None,
         fix_known_issues: bool = False,
         max_retries: int | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
     ) -> SyncErrorRecord | None:
         """:param wd_id:
         :param factgrid_id:
+        :param wd_item: prefetched Wikidata item of wd_id
+        :param references: references of the added FactGrid ID claim
+        :param circuit_breaker: skips the edit if Wikidata failed repeatedly
         :return:
         """
         result = None
@@ -219,16 +431,27 @@ class Bot:
                 factgrid_id=factgrid_id,
                 error_message=f"Mapping error both ids bust be defined Wikidata:{wd_id} FactGrid:{factgrid_id}",
             )
+        elif wd_item is None:
+            result = SyncErrorRecord(
+                wd_id=wd_id,
+                factgrid_id=factgrid_id,
+                error_message=f"Wikidata item {wd_id} could not be retrieved",
+            )
+        elif not self.wikidata.add_factgrid_id(wd_item, self.factgrid.get_entity_id(factgrid_id), references):
+            logger.debug(f"Wikidata item {wd_id} already has a FactGrid ID. Skipping edit")
+        elif circuit_breaker is not None and not circuit_breaker.allow_request():
+            result = SyncErrorRecord(wd_id=wd_id, factgrid_id=factgrid_id, error_message=CIRCUIT_OPEN_ERROR_MESSAGE)
         else:
-            wd_item = self.wikidata.get_item(wd_id)
-            self.wikidata.add_factgrid_id(wd_item, self.factgrid.get_entity_id(factgrid_id))
+            max_retries, retry_after = get_retry_params(circuit_breaker, max_retries)
             try:
-                self.wikidata.write_item(
-                    wd_item,
-                    summary="adds FactGrid ID",
-                    fix_known_issues=fix_known_issues,
-                    max_retries=max_retries,
-                )
+                with track_wikidata_request(circuit_breaker):
+                    self.wikidata.write_item(
+                        wd_item,
+                        summary="adds FactGrid ID",
+                        fix_known_issues=fix_known_issues,
+                        max_retries=max_retries,
+                        retry_after=retry_after,
+                    )
             except Exception as ex:
                 result = SyncErrorRecord(wd_id=wd_id, factgrid_id=factgrid_id, error_message=str(ex))
         return result
@@ -238,7 +461,7 @@ class Bot:
         factgrid_entity_class_id: str,
         wikidata_entity_class_id: str,
         language: str = "en",
-    ) -> list[tuple[str, list[str], list[str]]]:
+    ) -> list[tuple[str, tuple[str, ...], tuple[str, ...]]]:
         """Get the entities from Wikidata and FactGrid that share the same label given the corresponding entity class
         Only FactGrid entities with missing wikidata id are included
         :param factgrid_entity_class_id: id of the entity class in FactGrid
@@ -247,34 +470,50 @@ class Bot:
         :return: List of tuples.
             Each tuple contains:
                 the label,
-                list of FactGrid entities with the label and,
-                list of Wikidata entities with the label
+                tuple of Wikidata entities with the label and,
+                tuple of FactGrid entities with the label
         """
         if language is None:
             language = "en"
         factgrid_ids = self.factgrid.get_entities_with_missing_wikidata_id(
             entity_class_id=factgrid_entity_class_id,
         )  # Family Name
-        factgrid_family_labels_map = self.factgrid.get_entity_label(entity_ids=list(factgrid_ids), language=language)
+        factgrid_family_labels_map = self.factgrid.get_entity_label(entity_ids=factgrid_ids, language=language)
+        if not factgrid_family_labels_map:
+            logger.info(f"No labeled FactGrid entities of class {factgrid_entity_class_id} without Wikidata id")
+            return []
+        # Wikidata is only queried for the FactGrid labels thus every returned entity has a matching label
         wikidata_family_labels_map = self.wikidata.get_entities_by_labels(
             language=language,
             labels=set(factgrid_family_labels_map.values()),
             entity_class_id=wikidata_entity_class_id,
         )
-        label_to_fact_grid = defaultdict(list)
-        for qid, label in factgrid_family_labels_map.items():
-            label_to_fact_grid[label].append(qid)
-        label_to_wd = defaultdict(list)
-        for wd_id, label in wikidata_family_labels_map:
-            label_to_wd[label].append(wd_id)
+        label_to_fact_grid = self._group_ids_by_label(factgrid_family_labels_map.items())
+        label_to_wd = self._group_ids_by_label(wikidata_family_labels_map)
+        # iterate the smaller map and probe the larger one
+        factgrid_is_smaller = len(label_to_fact_grid) <= len(label_to_wd)
+        small, big = (label_to_fact_grid, label_to_wd) if factgrid_is_smaller else (label_to_wd, label_to_fact_grid)
         result = []
-        for label, wd_ids in label_to_wd.items():
-            fact_grid_ids = label_to_fact_grid.get(label, [])
-            if fact_grid_ids:
+        for label, small_ids in small.items():
+            big_ids = big.get(label)
+            if big_ids:
+                wd_ids, fact_grid_ids = (big_ids, small_ids) if factgrid_is_smaller else (small_ids, big_ids)
                 result.append((label, wd_ids, fact_grid_ids))
         return result
 
-    def get_missing_family_name_mappings(self) -> list[tuple[str, list[str], list[str]]]:
+    @staticmethod
+    def _group_ids_by_label(id_label_pairs: Iterable[tuple[str, str]]) -> dict[str, tuple[str, ...]]:
+        """Group the ids by their label
+        :param id_label_pairs: tuples of (id, label)
+        :return: mapping from label to the ids with this label
+        """
+        by_label = itemgetter(1)
+        return {
+            label: tuple(qid for qid, _ in group)
+            for label, group in groupby(sorted(id_label_pairs, key=by_label), key=by_label)
+        }
+
+    def get_missing_family_name_mappings(self) -> list[tuple[str, tuple[str, ...], tuple[str, ...]]]:
         """Get mappings from label to FactGrid and Wikidata ids
         :return:
         """
@@ -283,19 +522,67 @@ class Bot:
     def add_wikidata_id_to_factgrid_family_name(
         self,
         label_mappings: list[tuple[str, str, str]],
-        progress_callback: Callable[[], None] | None = None,
+        progress_callback: Callable[[int], None] | None = None,
+        max_workers: int = 4,
     ):
-        """Add missing family names to FactGrid"""
+        """Add missing family names to FactGrid
+        The FactGrid items are retrieved in chunks and only written if the Wikidata id is not yet linked
+        :param label_mappings:
+        :param progress_callback: called with the number of processed mappings
+        :param max_workers: number of parallel edits. Rate limited accounts (no bot flag) should use 1
+        """
+        fails = []
+        max_pending = 2 * max_workers
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending: set[Future] = set()
+            for mappings_chunk in self.factgrid.chunks(label_mappings, self.factgrid.MAX_ENTITIES_PER_REQUEST):
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        fails.extend(future.result())
+                future = executor.submit(
+                    self._add_wikidata_id_to_factgrid_family_name_chunk,
+                    label_mappings=mappings_chunk,
+                    progress_callback=progress_callback,
+                )
+                pending.add(future)
+            for future in as_completed(pending):
+                fails.extend(future.result())
+        return fails
+
+    def _add_wikidata_id_to_factgrid_family_name_chunk(
+        self,
+        label_mappings: list[tuple[str, str, str]],
+        progress_callback: Callable[[int], None] | None = None,
+    ) -> list[tuple[str, str, str]]:
+        """Prefetch the FactGrid items of the given mappings and add the Wikidata ids one by one
+        :param label_mappings:
+        :param progress_callback:
+        :return: failed mappings
+        """
         fails = []
+        try:
+            factgrid_items = self.factgrid.get_items(
+                (factgrid_id for _, _, factgrid_id in label_mappings),
+                # the sitelinks are needed to skip items that are already linked to Wikidata
+                props=self.factgrid.SITELINK_EDIT_PROPS,
+            )
+        except Exception as ex:
+            logger.error(f"Failed to retrieve FactGrid items: {ex}")
+            factgrid_items = {}
         for label, wikidata_id, factgrid_id in label_mappings:
             try:
-                fact_grid_item = self.factgrid.get_item(factgrid_id)
-                self.factgrid.add_wikidata_id_to(fact_grid_item, self.wikidata.get_entity_id(wikidata_id))
-                self.factgrid.write_item(fact_grid_item, summary="adds Wikidata ID")
-                logger.info(f"Added {wikidata_id} to {factgrid_id}")
+                fact_grid_item = factgrid_items.get(self.factgrid.get_entity_id(factgrid_id))
+                if fact_grid_item is None:
+                    raise ValueError(f"FactGrid entity {factgrid_id} could not be retrieved")
+                if self.factgrid.add_wikidata_id_to(fact_grid_item, self.wikidata.get_entity_id(wikidata_id)):
+                    self.factgrid.write_item(fact_grid_item, summary="adds Wikidata ID")
+                    logger.info(f"Added {wikidata_id} to {factgrid_id}")
+                else:
+                    logger.info(f"{factgrid_id} is already linked to {wikidata_id}")
             except Exception as ex:
                 logger.error(f"Failed to add Wikidata id {wikidata_id} to FactGrid entity {factgrid_id}: {ex}")
                 fails.append((label, factgrid_id, wikidata_id))
             if progress_callback:
-                progress_callback()
+                progress_callback(1)
         return fails
@@ -0,0 +1,106 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class Cache:
+    """Persistent key value cache for rarely changing lookups such as labels and property types
+    Values are stored as json in a sqlite database and expire after the configured number of seconds
+    """
+
+    DEFAULT_LOCATION = Path.home() / ".cache" / "factgridbot" / "cache.sqlite"
+    DEFAULT_EXPIRE = 86400
+    MAX_QUERY_PARAMS = 500
+
+    def __init__(self, path: Path | None = None, expire: int = DEFAULT_EXPIRE, enabled: bool = True):
+        """constructor
+        :param path: location of the sqlite database
+        :param expire: time to live of the cache entries in seconds
+        :param enabled: if False all lookups miss and nothing is stored
+        """
+        self.path = path if path is not None else self.DEFAULT_LOCATION
+        self.expire = expire
+        self.enabled = enabled
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Get the database connection. The database is created on first use"""
+        if self._connection is None:
+            self.path.parent.mkdir(exist_ok=True, parents=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets concurrent bot runs read the cache while another run writes to it
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT, created REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+        return self._connection
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> dict[str, Any]:
+        """Get the cached values for the given keys. Keys that are not cached or expired are not included
+        :param namespace:
+        :param keys:
+        :return:
+        """
+        if not self.enabled:
+            return {}
+        keys = list(keys)
+        min_created = time.time() - self.expire
+        result = {}
+        with self._lock:
+            for i in range(0, len(keys), self.MAX_QUERY_PARAMS):
+                chunk = keys[i : i + self.MAX_QUERY_PARAMS]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM cache WHERE namespace = ? AND created >= ? AND key IN ({placeholders})",
+                    (namespace, min_created, *chunk),
+                )
+                result.update({key: json.loads(value) for key, value in rows})
+        logger.debug(f"Cache hits for {namespace}: {len(result)}/{len(keys)}")
+        return result
+
+    def set_many(self, namespace: str, values: dict[str, Any]) -> None:
+        """Store the given values
+        :param namespace:
+        :param values:
+        :return:
+        """
+        if not self.enabled or not values:
+            return
+        created = time.time()
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value), created) for key, value in values.items()],
+            )
+
+    def delete(self, namespace: str, keys: Iterable[str]) -> None:
+        """Remove the given keys
+        :param namespace:
+        :param keys:
+        :return:
+        """
+        with self._lock, self.connection:
+            self.connection.executemany(
+                "DELETE FROM cache WHERE namespace = ? AND key = ?",
+                [(namespace, key) for key in keys],
+            )
+
+    def clear(self) -> None:
+        """Remove all cached entries"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM cache")
+
+
+default_cache = Cache()
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    """
+    States of the circuit breaker
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised if a request is skipped because the circuit is open
+    """
+
+
+class CircuitBreaker:
+    """Stops requests to a service after consecutive failures until the service had time to recover
+    After the reset timeout a single trial request is allowed. If it succeeds the circuit is closed again
+    """
+
+    DEFAULT_FAILURE_THRESHOLD = 5
+    DEFAULT_RESET_TIMEOUT = 30.0
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """constructor
+        :param failure_threshold: number of consecutive failures after which the circuit opens
+        :param reset_timeout: seconds after which an open circuit allows a trial request
+        :param clock: monotonic time source in seconds
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """Get the current state. An open circuit becomes half open once the reset timeout passed"""
+        with self._lock:
+            return self._get_state()
+
+    def _get_state(self) -> CircuitState:
+        if self._state is CircuitState.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Check if a request is allowed. In the half open state only a single trial request is allowed
+        :return:
+        """
+        with self._lock:
+            match self._get_state():
+                case CircuitState.CLOSED:
+                    return True
+                case CircuitState.HALF_OPEN if not self._trial_running:
+                    self._trial_running = True
+                    return True
+                case _:
+                    return False
+
+    @contextmanager
+    def track(self, ignore: tuple[type[Exception], ...] = ()) -> Iterator[None]:
+        """Record the outcome of the request executed in the with block
+        :param ignore: exceptions that are not caused by the service being unavailable. They count as success
+        :return:
+        """
+        try:
+            yield
+        except ignore:
+            self.record_success()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        else:
+            self.record_success()
+
+    def record_success(self) -> None:
+        """Record a successful request and close the circuit"""
+        with self._lock:
+            self.failures = 0
+            self._state = CircuitState.CLOSED
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        """Record a failed request and open the circuit if the failure threshold is reached or the trial failed"""
+        with self._lock:
+            self.failures += 1
+            if self._state is CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self._state is not CircuitState.OPEN:
+                    logger.warning(f"Opening circuit after {self.failures} consecutive failures")
+                self._state = CircuitState.OPEN
+                self._opened_at = self.clock()
+                self._trial_running = False
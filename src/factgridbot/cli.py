@@ -1,15 +1,22 @@
 import datetime
+import functools
 import logging
+import tempfile
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 from typing import Annotated
 
 import click
 import typer
+from pydantic import ValidationError
 from rich.console import Console
 from rich.logging import RichHandler
 from rich.progress import Progress
 from rich.table import Table
 
 from factgridbot.bot import Bot
+from factgridbot.cache import default_cache
 from factgridbot.models.auth import (
     Authorization,
     WikibaseAuthorizationConfig,
@@ -20,34 +27,93 @@ from factgridbot.models.auth import (
     WikibaseUserAuth,
 )
 from factgridbot.models.error import SyncErrorRecord
+from factgridbot.wikibase import Wikibase, is_qid
 
 app = typer.Typer()
 factgrid_add_app = typer.Typer()
 app.add_typer(factgrid_add_app, name="add", help="Add data to FactGrid")
+cache_app = typer.Typer()
+app.add_typer(cache_app, name="cache", help="Manage the local cache of labels and property types")
 
 console = Console()
 
+# failed syncs are written to a csv file and only a preview is printed if there are more than MAX_ERROR_TABLE_ROWS
+MAX_ERROR_TABLE_ROWS = 1000
+ERROR_TABLE_PREVIEW_ROWS = 50
+
+# dates of the sync --date option that are given by name
+DATE_SHORTCUTS: dict[str, Callable[[], datetime.date]] = {
+    "today": datetime.date.today,
+    "yesterday": lambda: datetime.date.today() - datetime.timedelta(days=1),
+}
+
+# choices of the authorization type prompt
+AUTH_TYPE_CHOICES = [auth_method.value for auth_method in WikibaseLoginTypes]
+AUTH_TYPE_CHOICE = click.Choice(AUTH_TYPE_CHOICES)
+
 
 FORMAT = "%(message)s"
 logging.basicConfig(level=logging.INFO, format=FORMAT, datefmt="[%X]", handlers=[RichHandler()])
 
 
+@functools.cache
+def get_bot() -> Bot:
+    """Get the bot. It is created once per process so that sessions and logins are reused across commands"""
+    return Bot(Bot.load_auth())
+
+
+@app.callback()
+def main(
+    no_cache: Annotated[
+        bool,
+        typer.Option("--no-cache", help="Do not use the local cache of labels and property types"),
+    ] = False,
+    cache_ttl: Annotated[
+        int,
+        typer.Option(help="Time in seconds after which cached labels, property types and mappings are retrieved again"),
+    ] = default_cache.DEFAULT_EXPIRE,
+):
+    default_cache.enabled = not no_cache
+    default_cache.expire = cache_ttl
+
+
 @app.command()
 def check(
     types: Annotated[bool, typer.Option(help="Check for property type mismatches")] = True,
     mapping: Annotated[bool, typer.Option(help="Check if mappings are a 1:1 mapping")] = True,
+    refresh_mappings: Annotated[
+        bool,
+        typer.Option("--refresh-mappings", help="Retrieve the current property mappings instead of the cached ones"),
+    ] = False,
 ):
-    bot = Bot(Bot.load_auth())
-    if types:
-        bot.check_property_type_mappings()
-    if mapping:
-        bot.check_duplicates_property_mappings()
+    bot = get_bot()
+    if refresh_mappings:
+        bot.factgrid.clear_cached_prop_mappings()
+    if types or mapping:
+        # both checks use the property mappings → retrieve them once before the checks run in parallel
+        bot.factgrid.get_prop_mappings()
+    # both checks are independent → build the tables in parallel and print them in order
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures: list[Future[Sequence[Table]]] = []
+        if types:
+            futures.append(executor.submit(lambda: (bot.get_property_type_mismatch_table(),)))
+        if mapping:
+            futures.append(executor.submit(bot.get_duplicate_property_mapping_tables))
+        for future in futures:
+            for table in future.result():
+                console.print(table)
 
 
 @app.command()
 def sync(
-    factgrid_entity: Annotated[str | None, typer.Option(help="FactGrid entity id to sync with wikidata")] = None,
-    wd_entity: Annotated[str | None, typer.Option(help="Wikidata entity id to sync with FactGrid")] = None,
+    factgrid_entity: Annotated[
+        list[str] | None,
+        typer.Option(help="FactGrid entity id to sync with wikidata. Can be given multiple times"),
+    ] = None,
+    wd_entity: Annotated[
+        list[str] | None,
+        typer.Option(help="Wikidata entity id to sync with FactGrid. Can be given multiple times"),
+    ] = None,
     all: Annotated[bool, typer.Option(help="Sync all missing entity links")] = False,
     date: Annotated[
         str | None,
@@ -65,30 +131,42 @@ def sync(
             help="Fix known entity issues to avoid mediawiki api errors. Fixes errors such as missing coordinate precision",  # noqa: E501
         ),
     ] = False,
+    workers: Annotated[
+        int,
+        typer.Option(help="Number of parallel edits. Without bot rights use 1 to stay within the edit rate limit"),
+    ] = 4,
+    read_workers: Annotated[
+        int,
+        typer.Option(help="Number of parallel Wikidata item retrievals feeding the edits"),
+    ] = 8,
 ):
     """
     Sync Wikidata back references with FactGrid.
     Adds the FactGrid Qid to Items that are in FactGrid and linked to Wikidata
     """
-    bot = Bot(Bot.load_auth())
+    bot = get_bot()
     mappings = []
     if factgrid_entity:
-        console.print(f"Starting sync for {factgrid_entity}")
-        mappings = bot.factgrid.get_reverse_item_mapping_for(
-            {bot.factgrid.item_prefix.unicode_string() + factgrid_entity},
+        factgrid_item_iris = get_item_iris(bot.factgrid, factgrid_entity)
+        console.print(f"Starting sync for {', '.join(factgrid_entity)}")
+        mappings = bot.filter_missing_factgrid_reference(
+            bot.factgrid.get_reverse_item_mapping_for(factgrid_item_iris),
         )
     elif wd_entity:
-        console.print(f"Starting sync for {wd_entity}")
-        mappings = bot.factgrid.get_item_mapping_for({bot.wikidata.item_prefix.unicode_string() + wd_entity})
+        wd_item_iris = get_item_iris(bot.wikidata, wd_entity)
+        console.print(f"Starting sync for {', '.join(wd_entity)}")
+        mappings = bot.filter_missing_factgrid_reference(
+            bot.factgrid.get_item_mapping_for(wd_item_iris),
+        )
     elif date:
-        if date == "today":
-            start_date = datetime.date.today()
-        elif date == "yesterday":
-            start_date = datetime.date.today() - datetime.timedelta(days=1)
+        date_shortcut = DATE_SHORTCUTS.get(date)
+        if date_shortcut is not None:
+            start_date = date_shortcut()
         else:
             try:
-                start_date = datetime.datetime.fromisoformat(date)
+                start_date = datetime.date.fromisoformat(date)
             except ValueError as ex:
+                console.print(f"Invalid date {date}. Use the iso-format (YYYY-MM-DD), 'today' or 'yesterday'")
                 raise typer.Abort() from ex
         mappings = bot.get_missing_wd_to_factgrid_item_reference_for(start_date)
     elif all:
@@ -97,20 +175,36 @@ def sync(
     else:
         console.print("No valid argument provided")
         raise typer.Abort()
-    console.print(f"Starting sync for {len(mappings)} Wikidata entities that are missing the FactGrid ID")
+    total = len(mappings)
+    console.print(f"Starting sync for {total} Wikidata entities that are missing the FactGrid ID")
     if not dry_run:
         with Progress() as progress:
-            total = len(mappings)
             task = progress.add_task("[green]Adding FactGrid IDs to Wikidata...", total=total)
             failed_syncs = bot.sync_wd_with_factgrid_ids(
                 mappings=mappings,
-                progress_callback=lambda _: progress.advance(task, 1),
+                progress_callback=functools.partial(progress.advance, task),
                 fix_known_issues=fix_known_issues,
+                max_workers=workers,
+                read_workers=read_workers,
             )
             if failed_syncs:
-                console.print(SyncErrorRecord.convert_list_to_table(failed_syncs))
+                errors_location = "the table above"
+                failed_syncs_file = None
+                if len(failed_syncs) > MAX_ERROR_TABLE_ROWS:
+                    try:
+                        failed_syncs_file = _write_failed_syncs_file(failed_syncs)
+                    except OSError as ex:
+                        console.print(f"[red]Failed to store the failed syncs in a file: {ex}")
+                if failed_syncs_file is not None:
+                    preview = SyncErrorRecord.convert_list_to_table(failed_syncs, max_rows=ERROR_TABLE_PREVIEW_ROWS)
+                    console.print(preview)
+                    errors_location = (
+                        f"{failed_syncs_file} (the table above shows the first {ERROR_TABLE_PREVIEW_ROWS})"
+                    )
+                else:
+                    console.print(SyncErrorRecord.convert_list_to_table(failed_syncs))
                 console.print(
-                    f"During the sync {len(failed_syncs)} items failed sync with Wikidata due to the errors listed in the table above",  # noqa: E501
+                    f"During the sync {len(failed_syncs)} items failed sync with Wikidata due to the errors listed in {errors_location}",  # noqa: E501
                 )
                 console.print(
                     "Try to run the sync with the option --fix-known-issues this can reduce the number of errors",
@@ -120,21 +214,43 @@ def sync(
 
 
 @app.command()
-def init():
+def init(
+    config_file: Annotated[
+        typer.FileText | None,
+        typer.Option(help="Read the authorization config from the given json file (- for stdin) instead of prompting"),
+    ] = None,
+):
     """Set up the authorization for the bot. Must only be executed once."""
-    factgrid_auth = wikibase_auth_dialog("FactGrid")
-    console.print(factgrid_auth.password)
-    wikidata_auth = wikibase_auth_dialog("Wikidata")
+    if config_file is not None:
+        try:
+            auth = Authorization.model_validate_json(config_file.read())
+        except ValidationError as ex:
+            console.print(f"Invalid authorization config: {ex}")
+            raise typer.Abort() from ex
+    else:
+        auth = Authorization(
+            factgrid=wikibase_auth_dialog("FactGrid"),
+            wikidata=wikibase_auth_dialog("Wikidata"),
+        )
     console.print(f"Storing bot credentials at {Bot.AUTH_STORAGE}")
-    auth = Authorization(
-        factgrid=factgrid_auth,
-        wikidata=wikidata_auth,
-    )
     Bot.store_auth(auth)
 
 
+@cache_app.command()
+def clear():
+    """Remove all entries from the local cache"""
+    default_cache.clear()
+    console.print(f"Cleared cache at {default_cache.path}")
+
+
 @factgrid_add_app.command()
-def family_names(force: Annotated[bool, typer.Option(help="If not set the changes have to be confirmed")] = False):
+def family_names(
+    force: Annotated[bool, typer.Option(help="If not set the changes have to be confirmed")] = False,
+    workers: Annotated[
+        int,
+        typer.Option(help="Number of parallel edits. Without bot rights use 1 to stay within the edit rate limit"),
+    ] = 4,
+):
     """Add Wikidata ID to family names if a family name with the same name exists in Wikidata."""
 
     def show_mapping_table(mappings):
@@ -151,7 +267,7 @@ def family_names(force: Annotated[bool, typer.Option(help="If not set the change
             table.add_row(*row)
         console.print(table)
 
-    bot = Bot(Bot.load_auth())
+    bot = get_bot()
     console.print(
         "Querying FactGrid and Wikidata for family names with the same name and missing Wikidata ID in FactGrid",
     )
@@ -181,7 +297,8 @@ def family_names(force: Annotated[bool, typer.Option(help="If not set the change
             task = progress.add_task("[green]Adding Wikidata IDs to FactGrid family names...", total=total)
             fails = bot.add_wikidata_id_to_factgrid_family_name(
                 label_mappings=valid_mappings,
-                progress_callback=lambda: progress.advance(task, 1),
+                progress_callback=functools.partial(progress.advance, task),
+                max_workers=workers,
             )
             if fails:
                 show_mapping_table(fails)
@@ -191,38 +308,82 @@ def family_names(force: Annotated[bool, typer.Option(help="If not set the change
                 )
 
 
-def wikibase_auth_dialog(name: str) -> WikibaseAuthorizationConfig | None:
+def get_item_iris(wikibase: Wikibase, entity_ids: list[str]) -> list[str]:
+    """Get the item IRIs of the given Qids or item IRIs. Aborts if one of them is not an item of the wikibase
+    :param wikibase:
+    :param entity_ids:
+    :return:
+    """
+    item_iris = {entity_id: wikibase.normalize_entity_id(entity_id) for entity_id in entity_ids}
+    invalid_ids = [entity_id for entity_id, iri in item_iris.items() if not is_qid(wikibase.get_entity_id(iri))]
+    if invalid_ids:
+        console.print(f"Not an item of {wikibase.website}: {', '.join(invalid_ids)}")
+        raise typer.Abort()
+    return list(item_iris.values())
+
+
+def _write_failed_syncs_file(failed_syncs: list[SyncErrorRecord]) -> Path:
+    """Write the given failed syncs to a new csv file in the temporary directory
+    Each sync gets its own file → concurrent runs do not overwrite each other's results
+    :param failed_syncs:
+    :return: path of the csv file
+    """
+    with tempfile.NamedTemporaryFile(prefix="factgrid_failed_syncs_", suffix=".csv", delete=False) as file:
+        path = Path(file.name)
+    SyncErrorRecord.write_csv(failed_syncs, path)
+    return path
+
+
+def _prompt_oauth2() -> WikibaseOauth2:
+    return WikibaseOauth2(
+        consumer_token=typer.prompt("Consumer Token", type=str),
+        consumer_secret=typer.prompt("Consumer secret", type=str),
+    )
+
+
+def _prompt_oauth1() -> WikibaseOauth1:
+    return WikibaseOauth1(
+        consumer_token=typer.prompt("Consumer Token", type=str),
+        consumer_secret=typer.prompt("Consumer secret", type=str),
+        access_token=typer.prompt("Access Token", type=str),
+        access_secret=typer.prompt("Access Secret", type=str),
+    )
+
+
+def _prompt_bot_auth() -> WikibaseBotAuth:
+    return WikibaseBotAuth(
+        auth_type=WikibaseLoginTypes.BOT,
+        user=typer.prompt("User", type=str),
+        password=typer.prompt("Password", type=str),
+    )
+
+
+def _prompt_user_auth() -> WikibaseUserAuth:
+    return WikibaseUserAuth(
+        user=typer.prompt("User", type=str),
+        password=typer.prompt("Password", type=str),
+    )
+
+
+# dialogs prompting the credentials of each authorization type
+_AUTH_CONSTRUCTORS: dict[WikibaseLoginTypes, Callable[[], WikibaseAuthorizationConfig]] = {
+    WikibaseLoginTypes.OAUTH2: _prompt_oauth2,
+    WikibaseLoginTypes.OAUTH1: _prompt_oauth1,
+    WikibaseLoginTypes.BOT: _prompt_bot_auth,
+    WikibaseLoginTypes.USER: _prompt_user_auth,
+}
+
+
+def wikibase_auth_dialog(name: str) -> WikibaseAuthorizationConfig:
     """Dialog to select a Wikibase authorization configuration.
     :return:
     """
     auth_type = typer.prompt(
         f"Which authorization type to use for {name}?",
-        type=click.Choice([auth_method.value for auth_method in WikibaseLoginTypes]),
+        type=AUTH_TYPE_CHOICE,
         show_choices=True,
     )
-    match WikibaseLoginTypes(auth_type):
-        case WikibaseLoginTypes.OAUTH2:
-            return WikibaseOauth2(
-                consumer_token=typer.prompt("Consumer Token", type=str),
-                consumer_secret=typer.prompt("Consumer secret", type=str),
-            )
-        case WikibaseLoginTypes.OAUTH1:
-            return WikibaseOauth1(
-                consumer_token=typer.prompt("Consumer Token", type=str),
-                consumer_secret=typer.prompt("Consumer secret", type=str),
-                access_token=typer.prompt("Access Token", type=str),
-                access_secret=typer.prompt("Access Secret", type=str),
-            )
-        case WikibaseLoginTypes.BOT:
-            return WikibaseBotAuth(
-                auth_type=WikibaseLoginTypes.BOT,
-                user=typer.prompt("User", type=str),
-                password=typer.prompt("Password", type=str),
-            )
-        case WikibaseLoginTypes.USER:
-            return WikibaseUserAuth(
-                user=typer.prompt("User", type=str),
-                password=typer.prompt("Password", type=str),
-            )
-        case _:
-            raise typer.Abort()
+    auth_constructor = _AUTH_CONSTRUCTORS.get(WikibaseLoginTypes(auth_type))
+    if auth_constructor is None:
+        raise typer.Abort()
+    return auth_constructor()
@@ -1,14 +1,50 @@
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
 from string import Template
+from typing import ClassVar
 
 from wikibaseintegrator.entities import ItemEntity
 
 from factgridbot.models.auth import WikibaseAuthorizationConfig
-from factgridbot.wikibase import Wikibase
+from factgridbot.wikibase import Wikibase, sparql_iri
+
+# prefixes of the Wikidata entity IRIs and of the Wikidata sitelinks stored in FactGrid
+WIKIDATA_ITEM_PREFIX = "http://www.wikidata.org/entity/"
+WIKIDATA_WIKI_PAGE_PREFIX = "https://www.wikidata.org/wiki/"
+
+# mapping between wikidata sitelinks and factgrid items for the given wikidata sitelinks
+ITEM_MAPPING_QUERY = Template("""
+PREFIX schema: <http://schema.org/>
+SELECT ?wd_qid ?factgrid_item
+WHERE{
+  VALUES ?wd_qid {
+    $source_entities
+  }
+  ?wd_qid schema:isPartOf <https://www.wikidata.org/>.
+  ?wd_qid schema:about ?factgrid_item.
+}
+""")
+
+# mapping between wikidata sitelinks and factgrid items for the given factgrid items
+REVERSE_ITEM_MAPPING_QUERY = Template("""
+PREFIX schema: <http://schema.org/>
+SELECT ?wd_qid ?factgrid_item
+WHERE{
+  VALUES ?factgrid_item {
+    $source_entities
+  }
+  ?wd_qid schema:isPartOf <https://www.wikidata.org/>.
+  ?wd_qid schema:about ?factgrid_item.
+}
+""")
 
 
 class FactGrid(Wikibase):
     """FactGrid Wikibase instance"""
 
+    # names of the cached property mapping query results
+    PROP_MAPPING_QUERIES: ClassVar[tuple[str, ...]] = ("prop_mappings", "properties_linked_to_wikidata")
+
     def __init__(self, auth_config: WikibaseAuthorizationConfig | None = None):
         super().__init__(
             sparql_endpoint="https://database.factgrid.de/sparql",
@@ -16,11 +52,18 @@ class FactGrid(Wikibase):
             item_prefix="https://database.factgrid.de/entity/",
             property_prefix="https://database.factgrid.de/prop/direct/",
             mediawiki_api_url="https://database.factgrid.de/w/api.php",
+            item_namespace=120,
             auth_config=auth_config,
         )
 
     def get_all_properties_linked_to_wikidata(self) -> set[str]:
         """Get all properties from FactGrid that are linked to Wikidata"""
+        return set(
+            self._cached_query_result("properties_linked_to_wikidata", self._query_properties_linked_to_wikidata)
+        )
+
+    def _query_properties_linked_to_wikidata(self) -> list[str]:
+        """Query all properties from FactGrid that are linked to Wikidata"""
         query = """
         SELECT ?property {
 
@@ -28,50 +71,33 @@ class FactGrid(Wikibase):
             ?property wdt:P343 ?wd_id.
         }
         """
-        lod = self.execute_query(query, endpoint_url=self.sparql_endpoint)
-        property_ids: set[str] = {d.get("property", "") for d in lod if isinstance(d.get("property"), str)}
-        return property_ids
+        rows = self.iter_query(query, endpoint_url=self.sparql_endpoint)
+        property_ids: set[str] = {prop for d in rows if isinstance(prop := d.get("property"), str)}
+        return sorted(property_ids)
+
+    def clear_cached_prop_mappings(self) -> None:
+        """Remove the cached property mappings so that the next access retrieves the current mappings"""
+        self._clear_cached_query_results(self.PROP_MAPPING_QUERIES)
 
     def get_prop_mapping_factgrid_to_wikidata(self) -> dict[str, list[str]]:
         """Get all properties from FactGrid that are linked to Wikidata"""
-        query = """
-        SELECT ?factgrid_prop (COUNT(?wd_prop) as ?count) (GROUP_CONCAT(?wd_prop; SEPARATOR="|") as ?ids) WHERE {
-          ?factgrid_prop rdf:type wikibase:Property;
-            wdt:P343 ?wd_id.
-          BIND(IRI(CONCAT("http://www.wikidata.org/entity/", ?wd_id)) as ?wd_prop)
-        }
-        GROUP BY ?factgrid_prop
-        """
-        lod = self.execute_query(query, endpoint_url=self.sparql_endpoint)
-        mapping = {
-            d.get("factgrid_prop", ""): d.get("ids", "").split("|")
-            for d in lod
-            if isinstance(d.get("factgrid_prop"), str) and isinstance(d.get("ids"), str)
-        }
-        return mapping
+        factgrid_to_wd, _ = self.get_prop_mappings_both_directions()
+        return factgrid_to_wd
 
     def get_prop_mapping_wikidata_to_factgrid(self) -> dict[str, list[str]]:
         """Get the property mapping from wikidata property to factgrid property
         :return:
         """
-        query = """
-        SELECT ?wd_prop (COUNT(?factgrid_prop) as ?count) (GROUP_CONCAT(?factgrid_prop; SEPARATOR="|") as ?ids) WHERE {
-          ?factgrid_prop rdf:type wikibase:Property;
-            wdt:P343 ?wd_id.
-          BIND(IRI(CONCAT("http://www.wikidata.org/entity/", ?wd_id)) as ?wd_prop)
-        }
-        GROUP BY ?wd_prop
-        """
-        lod = self.execute_query(query, endpoint_url=self.sparql_endpoint)
-        mapping = {
-            d.get("wd_prop", ""): d.get("ids", "").split("|")
-            for d in lod
-            if isinstance(d.get("wd_prop"), str) and isinstance(d.get("ids"), str)
-        }
-        return mapping
+        _, wd_to_factgrid = self.get_prop_mappings_both_directions()
+        return wd_to_factgrid
 
     def get_prop_mappings(self) -> list[tuple[str, str]]:
         """Get plain property mappings from wikidata to factgrid property as list of tuples"""
+        mappings = self._cached_query_result("prop_mappings", self._query_prop_mappings)
+        return [(wd_prop, factgrid_prop) for wd_prop, factgrid_prop in mappings]
+
+    def _query_prop_mappings(self) -> list[tuple[str, str]]:
+        """Query plain property mappings from wikidata to factgrid property as list of tuples"""
         query = """
         SELECT ?wd_prop ?factgrid_prop WHERE {
           ?factgrid_prop rdf:type wikibase:Property;
@@ -79,92 +105,94 @@ class FactGrid(Wikibase):
           BIND(IRI(CONCAT("http://www.wikidata.org/entity/", ?wd_id)) as ?wd_prop)
         }
         """
-        lod = self.execute_query(query, endpoint_url=self.sparql_endpoint)
+        rows = self.iter_query(query, endpoint_url=self.sparql_endpoint)
         return [
-            (d.get("wd_prop", ""), d.get("factgrid_prop", ""))
-            for d in lod
-            if isinstance(d.get("wd_prop"), str) and isinstance(d.get("factgrid_prop"), str)
+            (wd_prop, factgrid_prop)
+            for d in rows
+            if isinstance(wd_prop := d.get("wd_prop"), str) and isinstance(factgrid_prop := d.get("factgrid_prop"), str)
         ]
 
-    def get_item_mapping_for(self, wd_item_ids: set[str]) -> list[tuple[str, str]]:
+    def get_prop_mappings_both_directions(self) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+        """Get the property mapping from factgrid to wikidata and from wikidata to factgrid with a single query
+        :return: tuple of the factgrid to wikidata mapping and the wikidata to factgrid mapping
+        """
+        factgrid_to_wd: dict[str, list[str]] = defaultdict(list)
+        wd_to_factgrid: dict[str, list[str]] = defaultdict(list)
+        for wd_prop, factgrid_prop in self.get_prop_mappings():
+            factgrid_to_wd[factgrid_prop].append(wd_prop)
+            wd_to_factgrid[wd_prop].append(factgrid_prop)
+        return dict(factgrid_to_wd), dict(wd_to_factgrid)
+
+    def get_item_mapping_for(self, wd_item_ids: Iterable[str]) -> list[tuple[str, str]]:
         """Get mapping from wikidata to factgrid item
         :param wd_item_ids:
         :return:
         """
-        query = Template("""
-        PREFIX schema: <http://schema.org/>
-        SELECT ?wd_qid ?factgrid_item
-        WHERE{
-    
-          VALUES ?wd_qid {
-            $source_entities
-          }
-          ?wd_qid schema:isPartOf <https://www.wikidata.org/>.
-          ?wd_qid schema:about ?factgrid_item.
-        }
-        """)
-        values = [f"<{self.get_wikidata_sitelink_from_entity_id(wd_item)}>" for wd_item in wd_item_ids]
-        lod = self.execute_values_query_in_chunks(
-            query_template=query,
+        return list(self.iter_item_mapping_for(wd_item_ids))
+
+    def iter_item_mapping_for(self, wd_item_ids: Iterable[str]) -> Iterator[tuple[str, str]]:
+        """Yield the mapping from wikidata to factgrid item chunk by chunk as the queries finish
+        :param wd_item_ids:
+        :return:
+        """
+        rows = self.iter_values_query_in_chunks(
+            query_template=ITEM_MAPPING_QUERY,
             param_name="source_entities",
-            values=values,
+            values=wd_item_ids,
             endpoint_url=self.sparql_endpoint,
+            render=lambda wd_item: f"<{WIKIDATA_WIKI_PAGE_PREFIX}{wd_item.removeprefix(WIKIDATA_ITEM_PREFIX)}>",
         )
-        return [(self.get_wikidata_entity_id_from_sitelink(d.get("wd_qid")), d.get("factgrid_item")) for d in lod]
+        for d in rows:
+            if isinstance(wd_qid := d.get("wd_qid"), str) and isinstance(factgrid_item := d.get("factgrid_item"), str):
+                yield self.get_wikidata_entity_id_from_sitelink(wd_qid), factgrid_item
 
-    def get_reverse_item_mapping_for(self, factgrid_item_ids: set[str]) -> list[tuple[str, str]]:
+    def get_reverse_item_mapping_for(self, factgrid_item_ids: Iterable[str]) -> list[tuple[str, str]]:
         """Get mapping from wikidata to factgrid item for the given set of factgrid items
         :param wd_item_ids:
         :return:
         """
-        query = Template("""
-        PREFIX schema: <http://schema.org/>
-        SELECT ?wd_qid ?factgrid_item
-        WHERE{
-
-          VALUES ?factgrid_item {
-            $source_entities
-          }
-          ?wd_qid schema:isPartOf <https://www.wikidata.org/>.
-          ?wd_qid schema:about ?factgrid_item.
-        }
-        """)
-        values = [f"<{factgrid_item}>" for factgrid_item in factgrid_item_ids]
-        lod = self.execute_values_query_in_chunks(
-            query_template=query,
+        rows = self.iter_values_query_in_chunks(
+            query_template=REVERSE_ITEM_MAPPING_QUERY,
             param_name="source_entities",
-            values=values,
+            values=factgrid_item_ids,
             endpoint_url=self.sparql_endpoint,
+            render=sparql_iri,
         )
-        return [(self.get_wikidata_entity_id_from_sitelink(d.get("wd_qid")), d.get("factgrid_item")) for d in lod]
+        return [
+            (self.get_wikidata_entity_id_from_sitelink(wd_qid), factgrid_item)
+            for d in rows
+            if isinstance(wd_qid := d.get("wd_qid"), str) and isinstance(factgrid_item := d.get("factgrid_item"), str)
+        ]
 
     def get_all_referenced_wikidata_items(self) -> set[str]:
         """Get all referenced wikidata items"""
+        return set(self.iter_all_referenced_wikidata_items())
+
+    def iter_all_referenced_wikidata_items(self) -> Iterator[str]:
+        """Yield all referenced wikidata items (as wikidata sitelink) while the query result is streamed"""
         query = """
         PREFIX schema: <http://schema.org/>
         SELECT DISTINCT ?wd_qid 
         WHERE { ?wd_qid schema:isPartOf <https://www.wikidata.org/>. }
         """
-        lod = self.execute_query(query, endpoint_url=self.sparql_endpoint)
-        return {d.get("wd_qid", "") for d in lod if isinstance(d.get("wd_qid"), str)}
+        # the result has one row per FactGrid item linked to Wikidata → stream it
+        for (wd_qid,) in self.iter_query_tsv(query, endpoint_url=self.sparql_endpoint):
+            if wd_qid.startswith("<"):
+                yield wd_qid[1:-1]
 
     def get_wikidata_entity_id_from_sitelink(self, sitelink_url: str) -> str:
         """Get wikidata entity id from sitelink
         :param sitelink_url:
         :return:
         """
-        item_prefix = "http://www.wikidata.org/entity/"
-        wiki_page_prefix = "https://www.wikidata.org/wiki/"
-        return sitelink_url.replace(wiki_page_prefix, item_prefix)
+        return WIKIDATA_ITEM_PREFIX + sitelink_url.removeprefix(WIKIDATA_WIKI_PAGE_PREFIX)
 
     def get_wikidata_sitelink_from_entity_id(self, entity_id: str) -> str:
         """Get wikidata sitelink from entity id
         :param entity_id:
         :return:
         """
-        item_prefix = "http://www.wikidata.org/entity/"
-        wiki_page_prefix = "https://www.wikidata.org/wiki/"
-        return entity_id.replace(item_prefix, wiki_page_prefix)
+        return WIKIDATA_WIKI_PAGE_PREFIX + entity_id.removeprefix(WIKIDATA_ITEM_PREFIX)
 
     def get_entities_with_missing_wikidata_id(self, entity_class_id: str) -> set[str]:
         """:param entity_class_id:
@@ -174,26 +202,30 @@ class FactGrid(Wikibase):
         SELECT ?item
         WHERE{
           ?item wdt:P2 wd:$entity_class_id.
-          MINUS{
+          FILTER NOT EXISTS{
             ?wd_qid schema:isPartOf <https://www.wikidata.org/>.
             ?wd_qid schema:about ?item.
           }
         }
         """)
         query = query_template.substitute(entity_class_id=self.get_entity_id(entity_class_id))
-        lod = self.execute_query(
+        rows = self.iter_query(
             query=query,
             endpoint_url=self.sparql_endpoint,
         )
-        return {d.get("item", "") for d in lod if isinstance(d.get("item", None), str)}
+        return {item for d in rows if isinstance(item := d.get("item"), str)}
 
-    def add_wikidata_id_to(self, factgrid_entity: ItemEntity, wikidata_entity_id: str):
+    def add_wikidata_id_to(self, factgrid_entity: ItemEntity, wikidata_entity_id: str) -> bool:
         """Add wikidata id as sitelink to the given FactGrid entity id
         :param factgrid_entity:
         :param wikidata_entity_id:
-        :return:
+        :return: True if the entity was modified. False if the entity is already linked to the wikidata id
         """
+        sitelink = factgrid_entity.sitelinks.get("wikidatawiki")
+        if sitelink is not None and sitelink.title == wikidata_entity_id:
+            return False
         factgrid_entity.sitelinks.set(site="wikidatawiki", title=wikidata_entity_id)
+        return True
 
 
 if __name__ == "__main__":
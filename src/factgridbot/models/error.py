@@ -1,3 +1,6 @@
+import csv
+from pathlib import Path
+
 from pydantic import BaseModel
 from rich.table import Table
 
@@ -12,7 +15,12 @@ class SyncErrorRecord(BaseModel):
     error_message: str
 
     @classmethod
-    def convert_list_to_table(cls, records: list["SyncErrorRecord"]) -> Table:
+    def convert_list_to_table(cls, records: list["SyncErrorRecord"], max_rows: int | None = None) -> Table:
+        """Convert the given records to a table
+        :param records:
+        :param max_rows: maximum number of rows shown. The number of omitted records is shown in the caption
+        :return:
+        """
         table = Table(title="Failed Syncs")
 
         table.add_column("Wikidata ID", justify="left", style="cyan", no_wrap=True)
@@ -22,6 +30,21 @@ class SyncErrorRecord(BaseModel):
             justify="left",
             style="red",
         )
+        if max_rows is not None and len(records) > max_rows:
+            table.caption = f"… {len(records) - max_rows} more"
+            records = records[:max_rows]
         for record in records:
             table.add_row(record.wd_id, record.factgrid_id, record.error_message)
         return table
+
+    @classmethod
+    def write_csv(cls, records: list["SyncErrorRecord"], path: Path) -> None:
+        """Write the given records to a csv file
+        :param records:
+        :param path:
+        :return:
+        """
+        with path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(cls.model_fields)
+            writer.writerows((record.wd_id, record.factgrid_id, record.error_message) for record in records)
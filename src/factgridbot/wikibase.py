@@ -1,25 +1,82 @@
+import functools
 import hashlib
 import logging
+import re
+import threading
+from collections.abc import Callable, Iterable, Iterator
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
 from string import Template
+from typing import Any, ClassVar
 
-from pydantic import BaseModel, HttpUrl
-from SPARQLWrapper import JSON, POST, SPARQLWrapper
-from wikibaseintegrator import WikibaseIntegrator, wbi_login
+from pydantic import BaseModel, HttpUrl, PrivateAttr
+from requests.adapters import HTTPAdapter, Retry
+from wikibaseintegrator import WikibaseIntegrator, wbi_helpers, wbi_login
 from wikibaseintegrator.entities import ItemEntity, PropertyEntity
 from wikibaseintegrator.models import Snak
 
+from factgridbot.cache import default_cache
 from factgridbot.models.auth import WikibaseAuthorizationConfig, WikibaseLoginTypes
 
 logger = logging.getLogger(__name__)
 
+# Qid of an item without the namespace prefix
+QID_PATTERN = re.compile(r"Q[1-9]\d*")
+
+# retry SPARQL queries that are rate limited or hit a temporarily unavailable endpoint.
+# The queries are read only → POST requests are retried as well
+SPARQL_RETRY = Retry(
+    total=3,
+    backoff_factor=1,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=("GET", "POST"),
+    raise_on_status=False,
+)
+_sparql_session_lock = threading.Lock()
+
+# number of bytes read at once from streamed query results
+TSV_CHUNK_SIZE = 1 << 16
+
 
 def get_default_user_agent() -> str:
     """Get default user agent"""
     return f"FactGridSyncWdBot 1.0 ({date.today()})"
 
 
+def mediawiki_timestamp(value: datetime | date) -> str:
+    """Get the mediawiki api timestamp of the given date. Naive datetimes are interpreted as UTC"""
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def is_qid(value: str) -> bool:
+    """Check if the given value is an item Qid such as Q7"""
+    return QID_PATTERN.fullmatch(value) is not None
+
+
+def mount_sparql_adapter(endpoint_url: HttpUrl) -> None:
+    """Mount a retrying adapter for the given SPARQL endpoint on the pooled session of wikibaseintegrator
+    Mounting modifies the adapters of the shared session → mount only when constructing a Wikibase and not while
+    queries are executed by other threads
+    :param endpoint_url:
+    :return:
+    """
+    session = wbi_helpers.helpers_session
+    url = endpoint_url.unicode_string()
+    with _sparql_session_lock:
+        if url not in session.adapters:
+            session.mount(url, HTTPAdapter(max_retries=SPARQL_RETRY))
+
+
+def sparql_iri(iri: str) -> str:
+    """Get the SPARQL representation of the given IRI"""
+    return f"<{iri}>"
+
+
 class Wikibase(BaseModel):
     """Wikibase server"""
 
@@ -28,22 +85,49 @@ class Wikibase(BaseModel):
     item_prefix: HttpUrl
     property_prefix: HttpUrl
     mediawiki_api_url: HttpUrl
+    # mediawiki namespace of the item pages
+    item_namespace: int = 0
     auth_config: WikibaseAuthorizationConfig | None = None
+    # query results already retrieved in this process
+    _query_results: dict[str, Any] = PrivateAttr(default_factory=dict)
+    _wbi: WikibaseIntegrator | None = PrivateAttr(default=None)
+    _wbi_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    # maximum number of entities the mediawiki api returns per wbgetentities request
+    MAX_ENTITIES_PER_REQUEST: ClassVar[int] = 50
+    # parts of an entity needed to edit its claims. Labels, descriptions, aliases and sitelinks are not retrieved
+    CLAIM_EDIT_PROPS: ClassVar[str] = "info|claims"
+    # age of the oldest changes kept in the recent changes of the mediawiki api
+    RECENT_CHANGES_MAX_AGE: ClassVar[timedelta] = timedelta(days=30)
+    # parts of an entity needed to edit its claims and sitelinks
+    SITELINK_EDIT_PROPS: ClassVar[str] = "info|claims|sitelinks"
+
+    def model_post_init(self, __context: Any) -> None:
+        """Mount the retrying adapter of the SPARQL endpoint once the instance is constructed"""
+        mount_sparql_adapter(self.sparql_endpoint)
+
+    @functools.cached_property
+    def item_prefix_str(self) -> str:
+        """Get the item prefix as string. Serializing the url is computed only once per instance"""
+        return self.item_prefix.unicode_string()
 
     @classmethod
-    def chunks(cls, lst, n):
+    def chunks(cls, lst: Iterable, n: int) -> Iterator[list]:
         """Yield successive n-sized chunks from lst."""
-        for i in range(0, len(lst), n):
-            yield lst[i : i + n]
+        iterator = iter(lst)
+        while chunk := list(islice(iterator, n)):
+            yield chunk
 
     @classmethod
     def execute_values_query_in_chunks(
         cls,
         query_template: Template,
         param_name: str,
-        values: list[str],
+        values: Iterable[str],
         endpoint_url: HttpUrl,
         chunk_size: int = 1000,
+        query_params: dict[str, str] | None = None,
+        render: Callable[[str], str] | None = None,
     ):
         """Execute given query in chunks to speedup execution
         :param chunk_size:
@@ -51,14 +135,47 @@ class Wikibase(BaseModel):
         :param query_template:
         :param param_name:
         :param values:
+        :param query_params: additional template parameters that are the same for all chunks
+        :param render: converts a value to its SPARQL representation. If None the values are used as they are
+        :return:
+        """
+        return list(
+            cls.iter_values_query_in_chunks(
+                query_template, param_name, values, endpoint_url, chunk_size, query_params, render
+            ),
+        )
+
+    @classmethod
+    def iter_values_query_in_chunks(
+        cls,
+        query_template: Template,
+        param_name: str,
+        values: Iterable[str],
+        endpoint_url: HttpUrl,
+        chunk_size: int = 1000,
+        query_params: dict[str, str] | None = None,
+        render: Callable[[str], str] | None = None,
+    ) -> Iterator[dict]:
+        """Execute given query in chunks and yield the result rows of each chunk as soon as it is finished
+        Use this instead of execute_values_query_in_chunks if the result is directly aggregated
+        :param chunk_size:
+        :param endpoint_url:
+        :param query_template:
+        :param param_name:
+        :param values:
+        :param query_params: additional template parameters that are the same for all chunks
+        :param render: converts a value to its SPARQL representation. If None the values are used as they are
         :return:
         """
-        lod = []
+        query_params = query_params or {}
+        # deduplicated and sorted values result in the same chunk queries for the same values
+        # which allows the endpoint to cache them
+        values = sorted(set(values))
         with ThreadPoolExecutor(max_workers=10) as executor:
             futures = []
             for item_id_chunk in cls.chunks(values, chunk_size):
-                source_items = "\n".join(item_id_chunk)
-                query = query_template.substitute(**{param_name: source_items})
+                source_items = "\n".join(map(render, item_id_chunk) if render else item_id_chunk)
+                query = query_template.substitute(query_params, **{param_name: source_items})
                 logger.debug(f"Querying chunk of size {len(item_id_chunk)} labels from {endpoint_url}")
                 future = executor.submit(
                     cls.execute_query,
@@ -67,9 +184,7 @@ class Wikibase(BaseModel):
                 )
                 futures.append(future)
             for future in as_completed(futures):
-                lod_chunk = future.result()
-                lod.extend(lod_chunk)
-        return lod
+                yield from future.result()
 
     @classmethod
     def execute_query(cls, query: str, endpoint_url: HttpUrl) -> list[dict]:
@@ -78,34 +193,132 @@ class Wikibase(BaseModel):
         :param endpoint_url:
         :return:
         """
+        return list(cls.iter_query(query, endpoint_url))
+
+    @classmethod
+    def iter_query(cls, query: str, endpoint_url: HttpUrl) -> Iterator[dict]:
+        """Execute given query against given endpoint and yield the result rows one by one
+        Use this instead of execute_query if the result is directly aggregated to avoid an intermediate list
+        :param query:
+        :param endpoint_url:
+        :return:
+        """
         query_first_line = query.split("\n")[0][:30] if query.strip().startswith("#") else ""
         query_hash = hashlib.sha512(query.encode("utf-8")).hexdigest()
         logger.debug(f"Executing SPARQL query {query_first_line} ({query_hash}) against {endpoint_url}")
         start = datetime.now()
-        sparql = SPARQLWrapper(
+        response = wbi_helpers.helpers_session.post(
             endpoint_url.unicode_string(),
-            agent=get_default_user_agent(),
-            returnFormat=JSON,
+            data={"query": query},
+            headers={"Accept": "application/sparql-results+json", "User-Agent": get_default_user_agent()},
         )
-        sparql.setQuery(query)
-        sparql.setMethod(POST)
-        resp = sparql.query().convert()
+        response.raise_for_status()
+        resp = response.json()
         lod_raw = resp.get("results", {}).get("bindings")
         logger.debug(
             f"Query ({query_hash}) execution finished! execution time : {(datetime.now() - start).total_seconds()}s, No. results: {len(lod_raw)}",  # noqa: E501
         )
-        lod = []
         for d_raw in lod_raw:
             d = {key: record.get("value", None) for key, record in d_raw.items()}
             if d:
-                lod.append(d)
-        return lod
+                yield d
+
+    @classmethod
+    def iter_query_tsv(cls, query: str, endpoint_url: HttpUrl) -> Iterator[tuple[str, ...]]:
+        """Execute given query against given endpoint and stream the result rows as tab separated values
+        Values are in SPARQL syntax e.g. IRIs are enclosed in angle brackets and unbound values are empty.
+        Use this instead of iter_query for large results to avoid loading the complete response into memory
+        :param query:
+        :param endpoint_url:
+        :return:
+        """
+        query_hash = hashlib.sha512(query.encode("utf-8")).hexdigest()
+        logger.debug(f"Streaming SPARQL query ({query_hash}) results from {endpoint_url}")
+        with wbi_helpers.helpers_session.post(
+            endpoint_url.unicode_string(),
+            data={"query": query},
+            headers={"Accept": "text/tab-separated-values", "User-Agent": get_default_user_agent()},
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            lines = response.iter_lines(chunk_size=TSV_CHUNK_SIZE, decode_unicode=True)
+            # first line contains the variable names
+            next(lines, None)
+            for line in lines:
+                if line:
+                    yield tuple(line.split("\t"))
+
+    def _cached_lookup(
+        self,
+        namespace: str,
+        keys: set[str],
+        fetch: Callable[[set[str]], dict[str, Any]],
+    ) -> dict[str, Any]:
+        """Lookup the given keys in the persistent cache and only fetch the missing keys
+        Keys for which fetch returns no value are cached as misses
+        :param namespace: cache namespace the wikibase website is prepended to
+        :param keys:
+        :param fetch: function to retrieve the values for the keys not in the cache
+        :return:
+        """
+        namespace = f"{self.website}:{namespace}"
+        result = default_cache.get_many(namespace, keys)
+        missing_keys = keys - result.keys()
+        if missing_keys:
+            fetched = fetch(missing_keys)
+            default_cache.set_many(namespace, {key: fetched.get(key) for key in missing_keys})
+            result.update(fetched)
+        return {key: value for key, value in result.items() if value is not None}
+
+    def _cached_query_result(self, name: str, fetch: Callable[[], Any]) -> Any:
+        """Get the result of a parameterless query from the persistent cache or fetch and cache it
+        :param name: name of the query result in the cache
+        :param fetch: function to retrieve the result if it is not cached
+        :return: json compatible result. Tuples are returned as lists if served from the cache
+        """
+        if name in self._query_results:
+            return self._query_results[name]
+        namespace = f"{self.website}:query"
+        cached = default_cache.get_many(namespace, [name])
+        if name in cached:
+            result = cached[name]
+        else:
+            result = fetch()
+            default_cache.set_many(namespace, {name: result})
+        self._query_results[name] = result
+        return result
+
+    def _clear_cached_query_results(self, names: Iterable[str]) -> None:
+        """Remove the given query results from the persistent cache
+        :param names:
+        :return:
+        """
+        names = list(names)
+        for name in names:
+            self._query_results.pop(name, None)
+        default_cache.delete(f"{self.website}:query", names)
+
+    def _get_property_iris(self, prop_ids: Iterable[str]) -> set[str]:
+        """Get the property IRIs for the given property ids or IRIs
+        :param prop_ids:
+        :return:
+        """
+        prefix = self.item_prefix_str
+        return {prop_id if prop_id.startswith(prefix) else prefix + prop_id for prop_id in prop_ids}
 
     def get_property_types_of(self, prop_ids: set[str]) -> dict[str, str]:
         """Get the property types for the given properties
         :param prop_ids:
         :return:
         """
+        return self._cached_lookup("property_type", self._get_property_iris(prop_ids), self._query_property_types_of)
+
+    def _query_property_types_of(self, prop_iris: set[str]) -> dict[str, str]:
+        """Query the property types for the given property IRIs
+        :param prop_iris:
+        :return:
+        """
         query_template = Template("""
         SELECT ?property ?type {
           VALUES ?property {
@@ -115,31 +328,95 @@ class Wikibase(BaseModel):
           ?property wikibase:propertyType ?type.
         }
         """)
-        values = []
-        prefix = self.item_prefix.unicode_string()
-        for prop_id in prop_ids:
-            if not prop_id.startswith(prefix):
-                prop_id = prefix + prop_id
-            values.append(f"<{prop_id}>")
-
-        lod = self.execute_values_query_in_chunks(
+        rows = self.iter_values_query_in_chunks(
+            query_template=query_template,
+            param_name="prop_ids",
+            values=prop_iris,
+            endpoint_url=self.sparql_endpoint,
+            render=sparql_iri,
+        )
+        return {
+            prop: prop_type
+            for d in rows
+            if isinstance(prop := d.get("property"), str) and isinstance(prop_type := d.get("type"), str)
+        }
+
+    def get_property_labels_and_types(
+        self,
+        prop_ids: Iterable[str],
+        language: str | None = None,
+    ) -> dict[str, tuple[str | None, str | None]]:
+        """Get the label and the property type for the given properties with a single query per chunk
+        :param prop_ids:
+        :param language: if None english will be used
+        :return: mapping from property to the tuple (label, property type)
+        """
+        if language is None:
+            language = "en"
+        lookup = self._cached_lookup(
+            f"property_label_and_type:{language}",
+            self._get_property_iris(prop_ids),
+            lambda prop_iris: self._query_property_labels_and_types(prop_iris, language),
+        )
+        return {prop_iri: (label, prop_type) for prop_iri, (label, prop_type) in lookup.items()}
+
+    def _query_property_labels_and_types(
+        self,
+        prop_iris: set[str],
+        language: str,
+    ) -> dict[str, tuple[str | None, str | None]]:
+        """Query the label and the property type for the given property IRIs
+        :param prop_iris:
+        :param language:
+        :return:
+        """
+        query_template = Template("""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        SELECT ?property ?label ?type {
+          VALUES ?property {
+          $prop_ids
+          }
+          ?property rdf:type wikibase:Property.
+          ?property wikibase:propertyType ?type.
+          OPTIONAL { ?property rdfs:label ?label. FILTER(lang(?label)="$language") }
+        }
+        """)
+        rows = self.iter_values_query_in_chunks(
             query_template=query_template,
             param_name="prop_ids",
-            values=values,
+            values=prop_iris,
             endpoint_url=self.sparql_endpoint,
+            query_params={"language": language},
+            render=sparql_iri,
         )
-        return {d.get("property"): d.get("type") for d in lod}
+        return {prop: (d.get("label"), d.get("type")) for d in rows if isinstance(prop := d.get("property"), str)}
 
     def get_entity_label(
         self,
-        entity_ids: list[str],
+        entity_ids: Iterable[str],
         language: str | None = None,
+        batch_size: int = 1000,
     ) -> dict[str, str]:
         """Get the labels for the given entities
-        :param endpoint_url:
+        The ids are deduplicated and only the labels missing in the cache are queried
         :param entity_ids:
         :param language: if None english will be used
-        :param item_prefix:
+        :param batch_size: number of entities per label query
+        :return:
+        """
+        if language is None:
+            language = "en"
+        return self._cached_lookup(
+            f"label:{language}",
+            set(entity_ids),
+            lambda missing_ids: self._query_entity_label(missing_ids, language, batch_size),
+        )
+
+    def _query_entity_label(self, entity_ids: set[str], language: str, batch_size: int = 1000) -> dict[str, str]:
+        """Query the labels for the given entities
+        :param entity_ids:
+        :param language:
+        :param batch_size: number of entities per query
         :return:
         """
         query_raw = Template("""
@@ -152,17 +429,20 @@ class Wikibase(BaseModel):
           ?qid rdfs:label ?label. FILTER(lang(?label)="$language")
         }
         """)
-        if language is None:
-            language = "en"
-        query_template = Template(query_raw.safe_substitute(language=language, item_prefix=self.item_prefix))
-        values = [f"<{entity_id}>" for entity_id in entity_ids]
-        lod = self.execute_values_query_in_chunks(
-            query_template=query_template,
+        rows = self.iter_values_query_in_chunks(
+            query_template=query_raw,
             param_name="entity_ids",
-            values=values,
+            values=entity_ids,
             endpoint_url=self.sparql_endpoint,
+            chunk_size=batch_size,
+            query_params={"language": language},
+            render=sparql_iri,
         )
-        return {d.get("qid"): d.get("label") for d in lod}
+        return {
+            qid: label
+            for d in rows
+            if isinstance(qid := d.get("qid"), str) and isinstance(label := d.get("label"), str)
+        }
 
     def get_wbi_login(self) -> wbi_login._Login:
         """Get WikibaseIntegrator login
@@ -207,10 +487,11 @@ class Wikibase(BaseModel):
         """Get wbi instance for this wikibase instance
         :return:
         """
-        if not hasattr(self, "_wbi"):
-            login = self.get_wbi_login()
-            wbi = WikibaseIntegrator(login=login)
-            self._wbi = wbi
+        if self._wbi is None:
+            # the read and write workers access the instance concurrently → log in only once
+            with self._wbi_lock:
+                if self._wbi is None:
+                    self._wbi = WikibaseIntegrator(login=self.get_wbi_login())
         return self._wbi
 
     def get_item(self, qid: str) -> ItemEntity:
@@ -225,6 +506,70 @@ class Wikibase(BaseModel):
             user_agent=get_default_user_agent(),
         )
 
+    def get_items(
+        self,
+        qids: Iterable[str],
+        props: str | None = None,
+        max_retries: int | None = None,
+        retry_after: int | None = None,
+    ) -> dict[str, ItemEntity]:
+        """Get multiple wikibase items with one wbgetentities request per MAX_ENTITIES_PER_REQUEST items
+        Items that do not exist are not included in the result
+        :param qids: Qids or entity urls of the items
+        :param props: parts of the items to retrieve e.g. CLAIM_EDIT_PROPS. If None the complete items are retrieved
+        :param max_retries: maximum number of retries per request if the api is unavailable
+        :param retry_after: seconds to wait between the retries
+        :return: mapping from the Qid to the item
+        """
+        qids = [self.get_entity_id(qid) for qid in qids]
+        items = {}
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            futures = [
+                executor.submit(self._get_entities_json, qid_chunk, props, max_retries, retry_after)
+                for qid_chunk in self.chunks(qids, self.MAX_ENTITIES_PER_REQUEST)
+            ]
+            for future in as_completed(futures):
+                for qid, entity_json in future.result().items():
+                    if "missing" in entity_json:
+                        logger.debug(f"Item {qid} does not exist")
+                        continue
+                    # redirected items are returned under the id of the redirect target
+                    qid = entity_json.get("redirects", {}).get("from", qid)
+                    items[qid] = self.wbi.item.new().from_json(entity_json)
+        return items
+
+    def _get_entities_json(
+        self,
+        entity_ids: list[str],
+        props: str | None = None,
+        max_retries: int | None = None,
+        retry_after: int | None = None,
+    ) -> dict[str, dict]:
+        """Get the json of the given entities with a single wbgetentities request
+        :param entity_ids: at most MAX_ENTITIES_PER_REQUEST entity ids
+        :param props: parts of the entities to retrieve. If None the complete entities are retrieved
+        :param max_retries:
+        :param retry_after:
+        :return:
+        """
+        data = {"action": "wbgetentities", "ids": "|".join(entity_ids)}
+        if props is not None:
+            data["props"] = props
+        kwargs: dict[str, Any] = dict()
+        if max_retries is not None:
+            kwargs["max_retries"] = max_retries
+        if retry_after is not None:
+            kwargs["retry_after"] = retry_after
+        reply = wbi_helpers.mediawiki_api_call_helper(
+            data=data,
+            login=self.wbi.login,
+            allow_anonymous=True,
+            mediawiki_api_url=self.mediawiki_api_url.unicode_string(),
+            user_agent=get_default_user_agent(),
+            **kwargs,
+        )
+        return reply.get("entities", {})
+
     def write_item(
         self,
         item: ItemEntity,
@@ -232,9 +577,11 @@ class Wikibase(BaseModel):
         tags: list[str] | None = None,
         fix_known_issues: bool = False,
         max_retries: int | None = None,
+        retry_after: int | None = None,
     ) -> ItemEntity | None:
         """Write the given item to the wikibase instance
         :param max_retries:
+        :param retry_after:
         :param fix_known_issues:
         :param item: item to write
         :param summary: summary of the changes
@@ -245,6 +592,8 @@ class Wikibase(BaseModel):
         kwargs = dict()
         if max_retries is not None:
             kwargs["max_retries"] = max_retries
+        if retry_after is not None:
+            kwargs["retry_after"] = retry_after
         try:
             if fix_known_issues:
                 self._fix_known_entity_issues(item)
@@ -266,14 +615,27 @@ class Wikibase(BaseModel):
         :param entity_url:
         :return:
         """
-        return entity_url.removeprefix(self.item_prefix.unicode_string())
+        return entity_url.removeprefix(self.item_prefix_str)
 
-    def get_items_modified_at(self, start_date: datetime | date, end_date: datetime | date | None = None) -> set[str]:
+    def get_items_modified_at(
+        self,
+        start_date: datetime | date,
+        end_date: datetime | date | None = None,
+        use_api: bool = True,
+    ) -> set[str]:
         """Get items modified at a date range
         :param start_date:
         :param end_date:
-        :return:
+        :param use_api: If True the recent changes of the mediawiki api are used. Otherwise, the modification dates are
+        queried from the SPARQL endpoint. Date ranges older than RECENT_CHANGES_MAX_AGE are always queried via SPARQL
+        :return: IRIs of the modified items
         """
+        if end_date is None:
+            end_date = start_date + timedelta(days=1)
+        if use_api and self.is_in_recent_changes(start_date):
+            return self._get_items_changed_between(start_date, end_date)
+        elif use_api:
+            logger.info(f"{start_date} is not covered by the recent changes → querying the modified items via SPARQL")
         query_template = Template("""
         PREFIX schema: <http://schema.org/>
         SELECT DISTINCT ?item
@@ -282,11 +644,52 @@ class Wikibase(BaseModel):
           FILTER ( ?dateModified >= "$start_date"^^xsd:dateTime && ?dateModified <= "$end_date"^^xsd:dateTime)
         }
         """)
-        if end_date is None:
-            end_date = start_date + timedelta(days=1)
         query = query_template.substitute(start_date=start_date.isoformat(), end_date=end_date.isoformat())
-        lod = self.execute_query(query, self.sparql_endpoint)
-        return {d.get("item", "") for d in lod if isinstance(d.get("item"), str)}
+        rows = self.iter_query(query, self.sparql_endpoint)
+        return {item for d in rows if isinstance(item := d.get("item"), str)}
+
+    def is_in_recent_changes(self, value: datetime | date) -> bool:
+        """Check if the changes since the given date are covered by the recent changes of the mediawiki api
+        :param value:
+        :return:
+        """
+        oldest_recent_change = datetime.now(timezone.utc) - self.RECENT_CHANGES_MAX_AGE
+        # the timestamps have a fixed width and are therefore ordered like the dates
+        return mediawiki_timestamp(value) >= mediawiki_timestamp(oldest_recent_change)
+
+    def _get_items_changed_between(self, start_date: datetime | date, end_date: datetime | date) -> set[str]:
+        """Get the items changed in the given date range from the recent changes of the mediawiki api
+        :param start_date:
+        :param end_date:
+        :return: IRIs of the changed items
+        """
+        data = {
+            "action": "query",
+            "list": "recentchanges",
+            "rcstart": mediawiki_timestamp(start_date),
+            "rcend": mediawiki_timestamp(end_date),
+            "rcdir": "newer",
+            "rcnamespace": self.item_namespace,
+            "rctype": "edit|new",
+            "rcprop": "title",
+            "rclimit": "max",
+        }
+        items = set()
+        while True:
+            reply = wbi_helpers.mediawiki_api_call_helper(
+                data=data,
+                login=self.wbi.login,
+                allow_anonymous=True,
+                mediawiki_api_url=self.mediawiki_api_url.unicode_string(),
+                user_agent=get_default_user_agent(),
+            )
+            for change in reply.get("query", {}).get("recentchanges", []):
+                # titles of items outside the main namespace are prefixed with the namespace e.g. Item:Q1
+                items.add(self.item_prefix_str + change["title"].rpartition(":")[2])
+            if "continue" not in reply:
+                break
+            data.update(reply["continue"])
+        return items
 
     def _fix_known_entity_issues(self, entity: ItemEntity | PropertyEntity):
         """Fix known issues with entities that lead to a denial of the mediawiki api
@@ -317,6 +720,6 @@ class Wikibase(BaseModel):
         :param entity_id: id to normalize
         :return:
         """
-        if entity_id.startswith(self.item_prefix.unicode_string()):
+        if entity_id.startswith(self.item_prefix_str):
             return entity_id
-        return f"{self.item_prefix.unicode_string()}:{entity_id}"
+        return self.item_prefix_str + entity_id
@@ -1,4 +1,7 @@
+import functools
 import logging
+from collections.abc import Iterable
+from datetime import date, datetime, timezone
 from string import Template
 
 from wikibaseintegrator import datatypes
@@ -6,11 +9,51 @@ from wikibaseintegrator.entities import ItemEntity, PropertyEntity
 from wikibaseintegrator.models import Reference, References
 
 from factgridbot.models.auth import WikibaseAuthorizationConfig
-from factgridbot.wikibase import Wikibase
+from factgridbot.wikibase import Wikibase, sparql_iri
 
 logger = logging.getLogger(__name__)
 
 
+@functools.cache
+def get_factgrid_references_of(day: date) -> References:
+    """Get the references for a FactGrid ID claim: stated in FactGrid and retrieved at the given day
+    :param day:
+    :return:
+    """
+    references = References()
+    reference = Reference()
+    reference.add(datatypes.Item(prop_nr="P248", value="Q90405608"))  # stated in FactGrid
+    reference.add(datatypes.Time(prop_nr="P813", time=f"+{day.isoformat()}T00:00:00Z"))  # retrieved
+    references.add(reference)
+    return references
+
+
+# wikidata items of the given items that exist but have no FactGrid item ID (P8168)
+MISSING_FACTGRID_REFERENCE_QUERY = Template("""
+SELECT DISTINCT ?wd_id
+WHERE{
+  VALUES ?wd_id {
+    $wd_ids
+  }
+  ?wd_id schema:version ?version.
+  OPTIONAL{?wd_id wdt:P8168 ?factgrid_id.}
+  FILTER(!BOUND(?factgrid_id))
+}
+""")
+
+# wikidata entities of the given class with one of the given labels
+ENTITIES_BY_LABELS_QUERY = Template("""
+SELECT DISTINCT ?item ?label
+WHERE{
+  VALUES ?label{
+    $labels
+  }
+  ?item rdfs:label ?label.
+  ?item wdt:P31 wd:$entity_class_id
+}
+""")
+
+
 class Wikidata(Wikibase):
     """Wikidata Wikibase instance"""
 
@@ -27,42 +70,46 @@ class Wikidata(Wikibase):
             auth_config=auth_config,
         )
 
-    def retrieve_missing_factgrid_reference(self, item_ids: set[str]) -> set[str]:
+    def retrieve_missing_factgrid_reference(self, item_ids: Iterable[str], chunk_size: int = 15000) -> set[str]:
         """Retrieve the wikidata item IDs for which the factGrid link ( FactGrid item ID (P8168) ) is missing
         :param item_ids:
+        :param chunk_size: number of item ids per query
         :return:
         """
-        query_template = Template("""
-        SELECT DISTINCT ?wd_id
-        WHERE{
-          VALUES ?wd_id {
-            $wd_ids
-          }
-          ?wd_id schema:version ?version.
-          MINUS{?wd_id wdt:P8168 ?factgrid_id.}
-        }
-        """)
-        values = [f"<{entity_id}>" for entity_id in item_ids]
-        lod = self.execute_values_query_in_chunks(
-            query_template=query_template,
+        rows = self.iter_values_query_in_chunks(
+            query_template=MISSING_FACTGRID_REFERENCE_QUERY,
             param_name="wd_ids",
-            values=values,
+            values=item_ids,
             endpoint_url=self.sparql_endpoint,
-            chunk_size=15000,
+            render=sparql_iri,
+            chunk_size=chunk_size,
         )
-        return {d.get("wd_id") for d in lod}
+        return {wd_id for d in rows if isinstance(wd_id := d.get("wd_id"), str)}
 
-    def add_factgrid_id(self, entity: ItemEntity | PropertyEntity, factgrid_id: str):
+    def get_factgrid_references(self) -> References:
+        """Get the references for a FactGrid ID claim: stated in FactGrid and retrieved today (UTC)
+        The references are not modified when added to a claim and are therefore shared by all claims of the same day
+        :return:
+        """
+        return get_factgrid_references_of(datetime.now(timezone.utc).date())
+
+    def add_factgrid_id(
+        self,
+        entity: ItemEntity | PropertyEntity,
+        factgrid_id: str,
+        references: References | None = None,
+    ) -> bool:
         """Add the given FactGrid ID to the wikidata item
         if the factgrid id already exists do nothing
         if a different factgrid id exists raise an error
         :param entity:
         :param factgrid_id:
-        :return:
+        :param references: references of the new claim. If None the FactGrid references of today are used
+        :return: True if the entity was modified. False if the claim already exists or could not be added
         """
         if factgrid_id is None:
             logger.debug("No factgrid id provided")
-            return
+            return False
         property_id = None
         if isinstance(entity, ItemEntity):
             property_id = self.FACTGRID_ITEM_ID
@@ -70,7 +117,7 @@ class Wikidata(Wikibase):
             property_id = self.FACTGRID_PROPERTY_ID
         else:
             logger.debug("unsupported entity type {type(entity)}! No property defined for this type")
-            return
+            return False
         claims = entity.claims.get(property_id)
         if claims:
             logger.debug("FactGrid property {property_id} already exists for entity {entity_id}")
@@ -88,14 +135,13 @@ class Wikidata(Wikibase):
                     logger.debug(
                         f"Wikidata entity {entity.id} is linked to a different FactGrid entity {value} != {factgrid_id}",  # noqa: E501
                     )
+            return False
         else:
-            references = References()
-            reference = Reference()
-            reference.add(datatypes.Item(prop_nr="P248", value="Q90405608"))  # stated in FactGrid
-            reference.add(datatypes.Time(prop_nr="P813", time="now"))  # retrieved now
-            references.add(reference)
+            if references is None:
+                references = self.get_factgrid_references()
             new_claim = datatypes.ExternalID(prop_nr=property_id, value=factgrid_id, references=references)
             entity.add_claims(new_claim)
+            return True
 
     def get_entities_by_labels(self, labels: set[str], language: str, entity_class_id: str) -> list[tuple[str, str]]:
         """Get entity that have on of the labels of the given set
@@ -104,27 +150,18 @@ class Wikidata(Wikibase):
         :param labels:
         :return:
         """
-        query_template = Template("""
-        SELECT DISTINCT ?item ?label
-        WHERE{
-            VALUES ?label{
-                $labels
-            }
-            ?item rdfs:label ?label.
-            ?item wdt:P31 wd:$entity_class_id
-        }
-        """)
-        query = Template(query_template.safe_substitute(entity_class_id=self.get_entity_id(entity_class_id)))
-        string_template = Template('"$class_id"@$lang')
-        values = [
-            string_template.safe_substitute(class_id=entity_class_id.replace('"', r"\""), lang=language)
-            for entity_class_id in labels
-        ]
-        lod = self.execute_values_query_in_chunks(
-            query_template=query,
+        language_tag = f'"@{language}'
+        rows = self.iter_values_query_in_chunks(
+            query_template=ENTITIES_BY_LABELS_QUERY,
             param_name="labels",
-            values=values,
+            values=labels,
             endpoint_url=self.sparql_endpoint,
+            render=lambda label: '"' + label.replace('"', r"\"") + language_tag,
             chunk_size=3000,
+            query_params={"entity_class_id": self.get_entity_id(entity_class_id)},
         )
-        return [(d.get("item"), d.get("label")) for d in lod]
+        return [
+            (item, label)
+            for d in rows
+            if isinstance(item := d.get("item"), str) and isinstance(label := d.get("label"), str)
+        ]
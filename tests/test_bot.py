@@ -1,8 +1,49 @@
 import csv
 import logging
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
-from factgridbot.bot import Bot
+from wikibaseintegrator import WikibaseIntegrator
+from wikibaseintegrator.models import References
+from wikibaseintegrator.wbi_exceptions import MWApiError
+
+from factgridbot.bot import CIRCUIT_BREAKER_MAX_RETRIES, CIRCUIT_BREAKER_RETRY_AFTER, CIRCUIT_OPEN_ERROR_MESSAGE, Bot
+from factgridbot.circuit_breaker import CircuitBreaker, CircuitState
+from factgridbot.factgrid import FactGrid
+from factgridbot.models.auth import Authorization
+from factgridbot.wikidata import Wikidata
+
+
+def get_mappings(count: int) -> list[tuple[str, str]]:
+    """Get mappings between the Wikidata and FactGrid items Q1 to Q<count>"""
+    return [
+        (f"http://www.wikidata.org/entity/Q{i}", f"https://database.factgrid.de/entity/Q{i}")
+        for i in range(1, count + 1)
+    ]
+
+
+def get_items_json(sitelinks: dict[str, str]):
+    """Get a fake Wikibase.get_items which returns the items with the given Wikidata sitelinks
+    Only the requested props are included in the returned items
+    :param sitelinks: mapping from the Qid to the title of the Wikidata sitelink
+    :return:
+    """
+
+    def get_items(qids, props=None, **kwargs):
+        items = {}
+        for entity_id in qids:
+            qid = entity_id.rpartition("/")[2]
+            entity_json = {"type": "item", "id": qid, "lastrevid": 1, "claims": {}}
+            if (props is None or "sitelinks" in props) and qid in sitelinks:
+                entity_json["sitelinks"] = {
+                    "wikidatawiki": {"site": "wikidatawiki", "title": sitelinks[qid], "badges": []}
+                }
+            items[qid] = WikibaseIntegrator().item.new().from_json(entity_json)
+        return items
+
+    return get_items
 
 
 class TestBot(unittest.TestCase):
@@ -15,19 +56,14 @@ class TestBot(unittest.TestCase):
         logger.setLevel(logging.DEBUG)
         logging.basicConfig()
         bot = Bot(Bot.load_auth())
-        missing_ref_items = bot.get_all_missing_factgrid_items_in_wd()
+        missing_ref_items = bot.iter_all_missing_factgrid_items_in_wd()
         # missing_ref_items = [
         #     (
         #         "http://www.wikidata.org/entity/Q5",
         #         "https://database.factgrid.de/entity/Q7",
         #     )
         # ]
-        print(len(missing_ref_items))
-        factgrid_ids = {factgrid_id for _, factgrid_id in missing_ref_items}
-        wd_ids = {wikidata_id for wikidata_id, _ in missing_ref_items}
-        factgrid_labels = bot.factgrid.get_entity_label(entity_ids=factgrid_ids)
-        wd_labels = bot.wikidata.get_entity_label(entity_ids=wd_ids)
-        with open("/tmp/factgrid_mappings.csv", "w", newline="") as csvfile:
+        with open("/tmp/factgrid_mappings.csv", "w", newline="", buffering=1 << 20) as csvfile:
             fieldnames = [
                 "wd_id",
                 "wd_label",
@@ -39,13 +75,166 @@ class TestBot(unittest.TestCase):
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
             writer.writeheader()
-            for wd_id, factgrid_id in missing_ref_items:
-                writer.writerow(
+            count = 0
+            # resolve the labels batch by batch so that only a single batch is held in memory
+            for batch in bot.factgrid.chunks(missing_ref_items, 1000):
+                factgrid_labels = bot.factgrid.get_entity_label(entity_ids={factgrid_id for _, factgrid_id in batch})
+                wd_labels = bot.wikidata.get_entity_label(entity_ids={wikidata_id for wikidata_id, _ in batch})
+                writer.writerows(
                     {
                         "wd_id": wd_id,
                         "wd_label": wd_labels.get(wd_id, None),
                         "factgrid_id": factgrid_id,
                         "factgrid_label": factgrid_labels.get(factgrid_id, None),
-                    },
+                    }
+                    for wd_id, factgrid_id in batch
                 )
+                count += len(batch)
+        print(count)
         # on manual overview and validation of a few all the mappings are correct and can be applied
+
+    def test_group_ids_by_label(self):
+        """Tests _group_ids_by_label"""
+        id_label_pairs = [("Q1", "Müller"), ("Q2", "Schmidt"), ("Q3", "Müller")]
+        self.assertDictEqual(
+            {"Müller": ("Q1", "Q3"), "Schmidt": ("Q2",)},
+            Bot._group_ids_by_label(id_label_pairs),
+        )
+
+    def test_add_wikidata_id_to_factgrid_family_name(self):
+        """Tests that only FactGrid family names which are not yet linked to the Wikidata id are written"""
+        bot = Bot(Authorization())
+        label_mappings = [
+            ("Müller", "http://www.wikidata.org/entity/Q1", "https://database.factgrid.de/entity/Q10"),
+            ("Schmidt", "http://www.wikidata.org/entity/Q2", "https://database.factgrid.de/entity/Q20"),
+        ]
+        with (
+            patch.object(FactGrid, "get_items", side_effect=get_items_json({"Q10": "Q1"})),
+            patch.object(FactGrid, "write_item") as write_item,
+        ):
+            fails = bot.add_wikidata_id_to_factgrid_family_name(label_mappings)
+        self.assertListEqual([], fails)
+        self.assertEqual(1, write_item.call_count)
+        self.assertEqual("Q20", write_item.call_args.args[0].id)
+
+    def test_add_wikidata_id_to_factgrid_family_name_pool(self):
+        """Tests that each family name chunk is processed exactly once and that failed edits are collected"""
+        bot = Bot(Authorization())
+        label_mappings = [(f"Name {wd_id}", wd_id, factgrid_id) for wd_id, factgrid_id in get_mappings(300)]
+        written = []
+
+        def write_item(item, **kwargs):
+            written.append(item.id)
+            if int(item.id[1:]) % 50 == 0:
+                raise MWApiError({"code": "failed-save", "info": "Edit conflict", "messages": []})
+
+        progress = []
+        with (
+            patch.object(FactGrid, "get_items", side_effect=get_items_json({})),
+            patch.object(FactGrid, "write_item", side_effect=write_item),
+        ):
+            fails = bot.add_wikidata_id_to_factgrid_family_name(
+                label_mappings,
+                progress_callback=progress.append,
+                max_workers=2,
+            )
+        self.assertEqual(len(label_mappings), len(written))
+        self.assertEqual(len(label_mappings), len(set(written)))
+        self.assertSetEqual({factgrid_id for _, _, factgrid_id in label_mappings[49::50]}, {f[1] for f in fails})
+        self.assertEqual(len(label_mappings), sum(progress))
+
+    def test_sync_wd_with_factgrid_ids_circuit_breaker(self):
+        """Tests that the remaining mappings are skipped once Wikidata failed repeatedly"""
+        bot = Bot(Authorization())
+        mappings = get_mappings(400)
+        with (
+            patch.object(Wikidata, "get_factgrid_references", return_value=References()),
+            patch.object(Wikidata, "get_items", side_effect=ConnectionError("Wikidata is unavailable")),
+        ):
+            failed = bot.sync_wd_with_factgrid_ids(mappings, read_workers=1)
+        self.assertEqual(len(mappings), len(failed))
+        # the circuit opens after 5 failed chunks of 50 items
+        skipped = [record for record in failed if record.error_message == CIRCUIT_OPEN_ERROR_MESSAGE]
+        self.assertEqual(150, len(skipped))
+
+    def test_get_wd_items_of_api_error(self):
+        """Tests that api errors of the item retrieval do not open the circuit"""
+        bot = Bot(Authorization())
+        circuit_breaker = CircuitBreaker(failure_threshold=1)
+        api_error = MWApiError({"code": "no-such-entity", "info": "Could not find an entity", "messages": []})
+        with patch.object(Wikidata, "get_items", side_effect=api_error):
+            mappings = bot._get_wd_items_of([("Q1", "Q10")], circuit_breaker)
+        self.assertListEqual([("Q1", "Q10", None)], mappings)
+        self.assertEqual(CircuitState.CLOSED, circuit_breaker.state)
+
+    def test_sync_wd_with_factgrid_ids_retries(self):
+        """Tests that the Wikidata requests guarded by the circuit breaker are retried only a few times"""
+        bot = Bot(Authorization())
+        mappings = get_mappings(10)
+        with (
+            patch.object(Wikidata, "get_factgrid_references", return_value=References()),
+            patch.object(Wikidata, "get_items", side_effect=get_items_json({})) as get_items,
+            patch.object(Wikidata, "write_item") as write_item,
+        ):
+            bot.sync_wd_with_factgrid_ids(mappings)
+        for call in get_items.call_args_list + write_item.call_args_list:
+            self.assertEqual(CIRCUIT_BREAKER_MAX_RETRIES, call.kwargs["max_retries"])
+            self.assertEqual(CIRCUIT_BREAKER_RETRY_AFTER, call.kwargs["retry_after"])
+        self.assertEqual(len(mappings), write_item.call_count)
+
+    def test_sync_wd_with_factgrid_ids_progress(self):
+        """Tests that the progress is reported in batches of PROGRESS_BATCH_SIZE"""
+        bot = Bot(Authorization())
+        mappings = get_mappings(1000)
+        progress = []
+        with (
+            patch.object(Wikidata, "get_factgrid_references", return_value=References()),
+            patch.object(Wikidata, "get_items", side_effect=get_items_json({})),
+            patch.object(Wikidata, "write_item"),
+        ):
+            bot.sync_wd_with_factgrid_ids(mappings, progress_callback=progress.append)
+        self.assertEqual(len(mappings), sum(progress))
+        self.assertTrue(all(processed >= Bot.PROGRESS_BATCH_SIZE for processed in progress[:-1]))
+
+    def test_sync_wd_with_factgrid_ids(self):
+        """Tests that each mapping is synced exactly once and that failed edits are collected"""
+        bot = Bot(Authorization())
+        mappings = get_mappings(1000)
+        written = []
+
+        def write_item(item, **kwargs):
+            written.append(item.id)
+            if int(item.id[1:]) % 100 == 0:
+                raise MWApiError({"code": "failed-save", "info": "Edit conflict", "messages": []})
+
+        progress = []
+        with (
+            patch.object(Wikidata, "get_factgrid_references", return_value=References()),
+            patch.object(Wikidata, "get_items", side_effect=get_items_json({})),
+            patch.object(Wikidata, "write_item", side_effect=write_item),
+        ):
+            failed = bot.sync_wd_with_factgrid_ids(
+                mappings,
+                progress_callback=progress.append,
+                max_workers=2,
+                read_workers=3,
+            )
+        self.assertEqual(len(mappings), len(written))
+        self.assertSetEqual({wd_id.rpartition("/")[2] for wd_id, _ in mappings}, set(written))
+        self.assertSetEqual({wd_id for wd_id, _ in mappings[99::100]}, {record.wd_id for record in failed})
+        self.assertEqual(len(mappings), sum(progress))
+
+    def test_wbi_login_once(self):
+        """Tests that concurrent workers share a single login"""
+        bot = Bot(Authorization())
+
+        def get_wbi_login():
+            time.sleep(0.05)
+
+        with (
+            patch.object(Wikidata, "get_wbi_login", side_effect=get_wbi_login) as wbi_login,
+            ThreadPoolExecutor(max_workers=8) as executor,
+        ):
+            wbi_instances = list(executor.map(lambda _: bot.wikidata.wbi, range(8)))
+        self.assertEqual(1, wbi_login.call_count)
+        self.assertEqual(1, len({id(wbi) for wbi in wbi_instances}))
@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from factgridbot.cache import Cache
+
+
+class TestCache(unittest.TestCase):
+    """test Cache"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = Cache(path=Path(self.tmp_dir.name) / "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_many(self):
+        """Tests that only cached keys of the namespace are returned"""
+        self.cache.set_many("labels", {"Q1": "universe", "Q2": None})
+        self.cache.set_many("types", {"Q3": "string"})
+        self.assertDictEqual({"Q1": "universe", "Q2": None}, self.cache.get_many("labels", ["Q1", "Q2", "Q3"]))
+
+    def test_expire(self):
+        """Tests that expired entries are not returned"""
+        self.cache.set_many("labels", {"Q1": "universe"})
+        self.cache.expire = -1
+        self.assertDictEqual({}, self.cache.get_many("labels", ["Q1"]))
+
+    def test_disabled(self):
+        """Tests that a disabled cache neither stores nor returns values"""
+        self.cache.set_many("labels", {"Q1": "universe"})
+        self.cache.enabled = False
+        self.assertDictEqual({}, self.cache.get_many("labels", ["Q1"]))
+
+    def test_clear(self):
+        """Tests clearing the cache"""
+        self.cache.set_many("labels", {"Q1": "universe"})
+        self.cache.clear()
+        self.assertDictEqual({}, self.cache.get_many("labels", ["Q1"]))
@@ -0,0 +1,54 @@
+import unittest
+
+from factgridbot.circuit_breaker import CircuitBreaker, CircuitState
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """test CircuitBreaker"""
+
+    def setUp(self):
+        self.now = 0.0
+        self.circuit_breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=lambda: self.now)
+
+    def test_open_after_consecutive_failures(self):
+        """Tests that the circuit opens only after the threshold of consecutive failures"""
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_success()
+        self.circuit_breaker.record_failure()
+        self.circuit_breaker.record_failure()
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.circuit_breaker.record_failure()
+        self.assertEqual(CircuitState.OPEN, self.circuit_breaker.state)
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+    def test_half_open_trial(self):
+        """Tests that after the reset timeout a single trial request is allowed"""
+        for _ in range(3):
+            self.circuit_breaker.record_failure()
+        self.now = 30
+        self.assertEqual(CircuitState.HALF_OPEN, self.circuit_breaker.state)
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.assertFalse(self.circuit_breaker.allow_request())
+        self.circuit_breaker.record_failure()
+        self.assertEqual(CircuitState.OPEN, self.circuit_breaker.state)
+        self.now = 60
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.circuit_breaker.record_success()
+        self.assertEqual(CircuitState.CLOSED, self.circuit_breaker.state)
+        self.assertTrue(self.circuit_breaker.allow_request())
+
+    def test_track(self):
+        """Tests that track records failures of the with block except for the ignored exceptions"""
+        with self.assertRaises(ValueError), self.circuit_breaker.track(ignore=(ValueError,)):
+            raise ValueError()
+        for _ in range(2):
+            with self.assertRaises(ConnectionError), self.circuit_breaker.track(ignore=(ValueError,)):
+                raise ConnectionError()
+        self.assertEqual(CircuitState.CLOSED, self.circuit_breaker.state)
+        with self.circuit_breaker.track():
+            pass
+        for _ in range(3):
+            with self.assertRaises(ConnectionError), self.circuit_breaker.track():
+                raise ConnectionError()
+        self.assertEqual(CircuitState.OPEN, self.circuit_breaker.state)
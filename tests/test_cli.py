@@ -0,0 +1,67 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import click
+from typer.testing import CliRunner
+
+from factgridbot.bot import Bot
+from factgridbot.cli import _write_failed_syncs_file, app, get_item_iris
+from factgridbot.factgrid import FactGrid
+from factgridbot.models.auth import Authorization, WikibaseBotAuth, WikibaseOauth2
+from factgridbot.models.error import SyncErrorRecord
+
+
+class TestCli(unittest.TestCase):
+    """test cli"""
+
+    def test_write_failed_syncs_file(self):
+        """Tests that each sync writes its failed syncs to a new csv file"""
+        records = [SyncErrorRecord(wd_id="Q1", factgrid_id="Q2", error_message="Edit conflict")]
+        paths = [_write_failed_syncs_file(records) for _ in range(2)]
+        try:
+            self.assertNotEqual(paths[0], paths[1])
+            for path in paths:
+                self.assertEqual(".csv", path.suffix)
+                self.assertIn("Edit conflict", path.read_text(encoding="utf-8"))
+        finally:
+            for path in paths:
+                path.unlink()
+
+    def test_get_item_iris(self):
+        """Tests that Qids and item IRIs are normalized and that other ids abort"""
+        factgrid = FactGrid()
+        item_iri = "https://database.factgrid.de/entity/Q7"
+        self.assertListEqual([item_iri, item_iri], get_item_iris(factgrid, ["Q7", item_iri]))
+        invalid_ids = [
+            "P2",
+            "Q0",
+            "Q7x",
+            "http://www.wikidata.org/entity/Q7",
+            "https://database.factgrid.de/entity/P2",
+        ]
+        for entity_id in invalid_ids:
+            with self.subTest(entity_id=entity_id), self.assertRaises(click.exceptions.Abort):
+                get_item_iris(factgrid, ["Q7", entity_id])
+
+    def test_init_config_file(self):
+        """Tests that init stores a valid authorization config file and aborts on an invalid one"""
+        auth = Authorization(
+            factgrid=WikibaseBotAuth(user="bot", password="secret"),
+            wikidata=WikibaseOauth2(consumer_token="token", consumer_secret="secret"),
+        )
+        invalid_configs = ["{not json", '{"factgrid": {"auth_type": "password"}}']
+        runner = CliRunner()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            auth_storage = Path(tmp_dir) / "bot_auth.json"
+            with patch.object(Bot, "AUTH_STORAGE", auth_storage):
+                for config in invalid_configs:
+                    with self.subTest(config=config):
+                        result = runner.invoke(app, ["init", "--config-file", "-"], input=config)
+                        self.assertNotEqual(0, result.exit_code)
+                        self.assertIn("Invalid authorization config", result.output)
+                        self.assertFalse(auth_storage.exists())
+                result = runner.invoke(app, ["init", "--config-file", "-"], input=auth.model_dump_json())
+                self.assertEqual(0, result.exit_code, result.output)
+                self.assertEqual(auth, Authorization.model_validate_json(auth_storage.read_text()))
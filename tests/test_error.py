@@ -0,0 +1,34 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+from factgridbot.models.error import SyncErrorRecord
+
+
+class TestSyncErrorRecord(unittest.TestCase):
+    """test SyncErrorRecord"""
+
+    def setUp(self):
+        self.records = [
+            SyncErrorRecord(wd_id=f"Q{i}", factgrid_id=f"Q{i + 1}", error_message="Edit conflict, retry")
+            for i in range(10)
+        ]
+
+    def test_convert_list_to_table(self):
+        """Tests that the table is limited to max_rows and mentions the omitted records"""
+        table = SyncErrorRecord.convert_list_to_table(self.records, max_rows=3)
+        self.assertEqual(3, table.row_count)
+        self.assertEqual("… 7 more", table.caption)
+        table = SyncErrorRecord.convert_list_to_table(self.records)
+        self.assertEqual(10, table.row_count)
+        self.assertIsNone(table.caption)
+
+    def test_write_csv(self):
+        """Tests that all records are written to the csv file"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "failed_syncs.csv"
+            SyncErrorRecord.write_csv(self.records, path)
+            with path.open(newline="", encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+        self.assertListEqual([record.model_dump() for record in self.records], rows)
@@ -1,8 +1,14 @@
 import datetime
+import io
 import unittest
 from unittest import skipIf
+from unittest.mock import patch
+
+import requests
+from wikibaseintegrator import wbi_helpers
 
 from factgridbot.factgrid import FactGrid
+from factgridbot.wikibase import SPARQL_RETRY, is_qid
 from tests.basetest import IN_GITHUB_ACTIONS
 
 
@@ -27,3 +33,79 @@ class TestFactGrid(unittest.TestCase):
         factgrid = FactGrid()
         item_ids = factgrid.get_items_modified_at(datetime.date.today())
         self.assertGreaterEqual(len(item_ids), 1)
+
+    def test_wikidata_sitelink_conversion(self):
+        """Tests the conversion between Wikidata entity IRIs and sitelinks"""
+        factgrid = FactGrid()
+        entity_id = "http://www.wikidata.org/entity/Q42"
+        sitelink = "https://www.wikidata.org/wiki/Q42"
+        self.assertEqual(factgrid.get_wikidata_sitelink_from_entity_id(entity_id), sitelink)
+        self.assertEqual(factgrid.get_wikidata_entity_id_from_sitelink(sitelink), entity_id)
+
+    def test_normalize_entity_id(self):
+        """Tests that Qids and item IRIs are normalized to item IRIs"""
+        factgrid = FactGrid()
+        item_iri = "https://database.factgrid.de/entity/Q7"
+        self.assertEqual(factgrid.normalize_entity_id("Q7"), item_iri)
+        self.assertEqual(factgrid.normalize_entity_id(item_iri), item_iri)
+        self.assertTrue(is_qid(factgrid.get_entity_id(item_iri)))
+        self.assertFalse(is_qid("P2"))
+
+    def test_is_in_recent_changes(self):
+        """Tests that only dates within the recent changes max age use the recent changes api"""
+        factgrid = FactGrid()
+        self.assertTrue(factgrid.is_in_recent_changes(datetime.date.today()))
+        self.assertFalse(factgrid.is_in_recent_changes(datetime.date(2024, 1, 1)))
+
+    def test_sparql_adapter_mounted(self):
+        """Tests that the retrying adapter of the SPARQL endpoint is mounted when the instance is constructed"""
+        factgrid = FactGrid()
+        adapter = wbi_helpers.helpers_session.get_adapter(factgrid.sparql_endpoint.unicode_string())
+        self.assertIs(SPARQL_RETRY, adapter.max_retries)
+
+    def test_get_items_changed_between(self):
+        """Tests that all pages of the recent changes are retrieved and the titles converted to item IRIs"""
+        factgrid = FactGrid()
+        replies = [
+            {
+                "continue": {"rccontinue": "20240102000000|42", "continue": "-||"},
+                "query": {"recentchanges": [{"title": "Item:Q1"}, {"title": "Item:Q2"}]},
+            },
+            {"query": {"recentchanges": [{"title": "Item:Q2"}, {"title": "Item:Q3"}]}},
+        ]
+        requests = []
+
+        def mediawiki_api_call_helper(data, **kwargs):
+            requests.append(dict(data))
+            return replies[len(requests) - 1]
+
+        with patch(
+            "factgridbot.wikibase.wbi_helpers.mediawiki_api_call_helper",
+            side_effect=mediawiki_api_call_helper,
+        ):
+            items = factgrid._get_items_changed_between(datetime.date(2024, 1, 1), datetime.date(2024, 1, 3))
+        self.assertSetEqual({f"https://database.factgrid.de/entity/Q{i}" for i in range(1, 4)}, items)
+        self.assertEqual(2, len(requests))
+        self.assertNotIn("rccontinue", requests[0])
+        self.assertEqual("20240102000000|42", requests[1]["rccontinue"])
+        self.assertEqual(factgrid.item_namespace, requests[1]["rcnamespace"])
+
+    def test_iter_all_referenced_wikidata_items(self):
+        """Tests that the streamed tsv result is split into lines and the IRIs are unwrapped"""
+        factgrid = FactGrid()
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(
+            b"?wd_qid\r\n"
+            b"<https://www.wikidata.org/wiki/Q1>\r\n"
+            b"\r\n"
+            b'"not an IRI"\r\n'
+            b"<https://www.wikidata.org/wiki/Q2>\r\n"
+        )
+        # small chunks split the line breaks between chunks
+        with (
+            patch("factgridbot.wikibase.TSV_CHUNK_SIZE", 3),
+            patch.object(wbi_helpers.helpers_session, "post", return_value=response),
+        ):
+            sitelinks = list(factgrid.iter_all_referenced_wikidata_items())
+        self.assertListEqual(["https://www.wikidata.org/wiki/Q1", "https://www.wikidata.org/wiki/Q2"], sitelinks)
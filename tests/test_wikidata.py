@@ -14,12 +14,15 @@ class TestWikidata(unittest.TestCase):
         Test adding factgrid id
         """
         wikidata = Wikidata()
-        item = wikidata.get_item("Q110634087")
+        # only the claims are needed to add the FactGrid id
+        item = wikidata.get_items(["Q110634087"], props=wikidata.CLAIM_EDIT_PROPS)["Q110634087"]
+        self.assertFalse(item.labels.get("en"))
         factgrid_id = "Q998314"
         self.assertTrue(item.claims.get(wikidata.FACTGRID_ITEM_ID))
         del item.claims.claims[wikidata.FACTGRID_ITEM_ID]
         self.assertFalse(item.claims.get(wikidata.FACTGRID_ITEM_ID))
-        wikidata.add_factgrid_id(item, factgrid_id)
+        self.assertTrue(wikidata.add_factgrid_id(item, factgrid_id))
+        self.assertFalse(wikidata.add_factgrid_id(item, factgrid_id))
         claims = item.claims.get(wikidata.FACTGRID_ITEM_ID)
         self.assertTrue(claims)
         self.assertEqual(len(claims[0].references.references[0]), 2)